@@ -0,0 +1,128 @@
+import collections
+import numpy as np
+
+
+# turns action chunks into per physics step joint targets, pure numpy (no simulator or server needed)
+# time is counted in policy steps (one chunk row per policy step), a chunk added at policy step s covers s .. s + len - 1
+# executor = ActionExecutor(substeps=2)
+# executor.add_chunk(joint_trajectory, start=0)
+# executor.physics_action(physics_step, out=target)
+
+
+class ActionExecutor:
+    """
+    temporal ensembling of overlapping chunks (as in ACT): every chunk covering a policy step predicts an action for it,
+    the predictions are averaged with weights exp(-ensemble_decay * i), i = 0 for the oldest chunk;
+    ensemble_decay = 0 is a plain mean, larger values trust the older chunks more, negative values the newer ones
+    substeps: physics steps per policy step, the targets in between are linearly interpolated between the ensembled waypoints
+    max_chunks: chunks kept for ensembling, the oldest is dropped first
+    past the newest chunk the last waypoint is held
+    with non-overlapping chunks and substeps = 1 every physics step gets exactly the chunk row (open-loop chunk replay)
+    """
+    def __init__(self, joint_num: int = 54, substeps: int = 1, ensemble_decay: float = 0.01, max_chunks: int = 4):
+        if substeps < 1:
+            raise ValueError(f"substeps must be >= 1, got {substeps}")
+        self.joint_num = joint_num
+        self.substeps = substeps
+        self.ensemble_decay = ensemble_decay
+        self.chunks = collections.deque(maxlen=max_chunks) # (start policy step, (len, joint num) actions), oldest first
+        self._lower = np.zeros(shape=(joint_num, ), dtype=float)
+        self._upper = np.zeros(shape=(joint_num, ), dtype=float)
+
+    def reset(self):
+        self.chunks.clear()
+
+    def add_chunk(self, actions: np.ndarray, start: int):
+        """
+        actions: (len, joint num), copied
+        start: policy step of actions[0]
+        """
+        self.chunks.append((start, np.array(actions, dtype=float)))
+
+    def end(self) -> int:
+        """
+        first policy step not covered by any chunk
+        """
+        return max((start + len(actions) for start, actions in self.chunks), default=0)
+
+    def action(self, policy_step: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        ensembled action at an integer policy step
+        """
+        if out is None:
+            out = np.zeros(shape=(self.joint_num, ), dtype=float)
+        if not self.chunks:
+            raise RuntimeError("no action chunk added yet")
+        policy_step = min(policy_step, self.end() - 1) # hold the last waypoint
+        out[:] = 0.0
+        weight_sum = 0.0
+        chunk_idx = 0
+        for start, actions in self.chunks:
+            row = policy_step - start
+            if 0 <= row < len(actions):
+                weight = np.exp(-self.ensemble_decay * chunk_idx)
+                out += weight * actions[row]
+                weight_sum += weight
+                chunk_idx += 1
+        if weight_sum == 0.0: # before the oldest chunk still kept
+            start, actions = self.chunks[0]
+            out[:] = actions[0]
+            return out
+        if chunk_idx > 1:
+            out /= weight_sum
+        return out
+
+    def physics_action(self, physics_step: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        joint target of a physics step, physics_step / substeps policy steps into the timeline
+        """
+        policy_step, substep = divmod(physics_step, self.substeps)
+        if substep == 0:
+            return self.action(policy_step, out=out)
+        self.action(policy_step, out=self._lower)
+        self.action(policy_step + 1, out=self._upper)
+        if out is None:
+            out = np.zeros(shape=(self.joint_num, ), dtype=float)
+        alpha = substep / self.substeps
+        np.multiply(self._lower, 1.0 - alpha, out=out)
+        out += alpha * self._upper
+        return out
+
+
+class AdaptiveHorizon:
+    """
+    picks how many policy steps of each chunk are executed before replanning (the replan horizon)
+    a short horizon tracks better (fresh observations more often) but costs one inference per cycle, so:
+    - tracking error above tracking_tolerance (and latency within budget): shorten, spend compute on tracking
+    - latency (moving average) above latency_budget_ms, or tracking error below half the tolerance: lengthen, save compute
+    tracking error: mean absolute difference (rad) between the observed and the last commanded positions of the gr00t joints
+    """
+    def __init__(self, min_horizon: int = 4, max_horizon: int = 16, initial_horizon: int = 8, step: int = 2, latency_budget_ms: float = 100.0, tracking_tolerance: float = 0.05, latency_smoothing: float = 0.3):
+        if not 1 <= min_horizon <= initial_horizon <= max_horizon:
+            raise ValueError(f"expected 1 <= min_horizon <= initial_horizon <= max_horizon, got {min_horizon}, {initial_horizon}, {max_horizon}")
+        self.min_horizon = min_horizon
+        self.max_horizon = max_horizon
+        self.initial_horizon = initial_horizon
+        self.step = step
+        self.latency_budget_ms = latency_budget_ms
+        self.tracking_tolerance = tracking_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.reset()
+
+    def reset(self):
+        self.horizon = self.initial_horizon
+        self.latency_ms = None
+
+    def update(self, latency: float, tracking_error: float) -> int:
+        """
+        latency: round trip of the last inference (seconds)
+        returns the horizon for the coming cycle
+        """
+        latency_ms = latency * 1000
+        self.latency_ms = latency_ms if self.latency_ms is None else (1 - self.latency_smoothing) * self.latency_ms + self.latency_smoothing * latency_ms
+        overloaded = self.latency_ms > self.latency_budget_ms
+        if tracking_error > self.tracking_tolerance and not overloaded:
+            self.horizon = max(self.min_horizon, self.horizon - self.step)
+        elif overloaded or tracking_error < self.tracking_tolerance / 2:
+            self.horizon = min(self.max_horizon, self.horizon + self.step)
+        return self.horizon
@@ -0,0 +1,43 @@
+# compares decoding a 16-step gr00t action chunk timestep by timestep with the vectorized whole-chunk conversion
+
+import time
+import numpy as np
+import gr1_config
+import gr1_gr00t_utils
+
+
+REPEAT = 2000
+ACTION_HORIZON = 16
+
+
+def make_fake_output(as_list: bool) -> dict:
+    rng = np.random.default_rng(0)
+    output = {}
+    for joint_part, joint_indexes in gr1_config.gr00t_joints_index.items():
+        actions = rng.normal(size=(ACTION_HORIZON, len(joint_indexes)))
+        output[f"action.{joint_part}"] = actions.tolist() if as_list else actions
+    return output
+
+
+def per_timestep(output: dict) -> np.ndarray:
+    return np.stack([gr1_gr00t_utils.make_joint_position_from_gr00t_output(output, timestep=timestep) for timestep in range(ACTION_HORIZON)])
+
+
+def main():
+    for as_list in [True, False]:
+        output = make_fake_output(as_list)
+        buffer = np.zeros(shape=(ACTION_HORIZON, 54), dtype=float)
+        assert np.array_equal(per_timestep(output), gr1_gr00t_utils.make_joint_trajectory_from_gr00t_output(output, out=buffer))
+        for name, decode in [
+            ("per timestep", lambda: per_timestep(output)),
+            ("vectorized", lambda: gr1_gr00t_utils.make_joint_trajectory_from_gr00t_output(output, out=buffer)),
+        ]:
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                decode()
+            elapsed = (time.perf_counter() - start) / REPEAT * 1e6
+            print(f"{'json lists' if as_list else 'arrays':>10} {name:>12}: {elapsed:8.1f} us per chunk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# measures the overhead of the closed control loop (gr1_rollout.run_episode) without Isaac Sim or a GPU:
+# FakeGr1Env as the simulator and StubPolicy behind a local inference server
+
+import numpy as np
+import gr1_env, gr1_gr00t_utils, gr1_rollout
+import gr00t_server_utils
+
+
+EPISODE_NUM = 3
+EACH_EPISODE_LEN = 30
+STUB_LATENCY = 0.0 # seconds per forward pass, 0 isolates the loop + transport overhead
+HOST = "localhost"
+PORT = 9878
+TASK = "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl."
+
+
+def main():
+    app = gr00t_server_utils.create_app(gr00t_server_utils.StubPolicy(fixed_latency=STUB_LATENCY, per_sample_latency=0.0), verbose=False)
+    server = gr00t_server_utils.serve_in_thread(app, host=HOST, port=PORT)
+    env = gr1_env.FakeGr1Env()
+    try:
+        for wire_format in ["json", "binary"]:
+            client = gr1_gr00t_utils.Gr00tInferenceClient(url=f"http://{HOST}:{PORT}/inference", wire_format=wire_format)
+            results = [gr1_rollout.run_episode(env, client, task=TASK, episode_len=EACH_EPISODE_LEN, seed=seed) for seed in range(EPISODE_NUM)]
+            client.close()
+            duration = np.sum([result["duration_s"] for result in results])
+            inference = np.sum(client.call_latencies)
+            steps = np.sum([result["physics_steps"] for result in results])
+            print(
+                f"{wire_format:>6}: {steps / duration:8.1f} physics steps/s  "
+                f"inference {inference / duration * 100:5.1f}% of wall time  "
+                f"loop overhead {(duration - inference) / steps * 1e6:7.1f} us per physics step"
+            )
+    finally:
+        env.close()
+        gr00t_server_utils.stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
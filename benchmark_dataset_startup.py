@@ -0,0 +1,57 @@
+# this uses the gr00t conda environment
+# compares dataset construction time without the index cache, with an empty cache (cold) and with a filled one (warm)
+# python benchmark_dataset_startup.py --preset NutPouring
+
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+from gr00t.experiment.data_config import DATA_CONFIG_MAP
+from gr00t.data.schema import EmbodimentTag
+
+import experiment_config
+from dataset_index_cache import CachedIndexLeRobotDataset, dataset_fingerprint
+
+
+REPEAT_NUM = 3
+
+
+def build_dataset(config: experiment_config.FinetuneConfig, index_cache_dir) -> float:
+    data_config = DATA_CONFIG_MAP[config.embodiment_config]
+    start = time.perf_counter()
+    CachedIndexLeRobotDataset(
+        dataset_path=config.dataset_path,
+        modality_configs=data_config.modality_config(),
+        embodiment_tag=EmbodimentTag(config.embodiment_tag),
+        video_backend=config.video_backend,
+        video_backend_kwargs=None,
+        transforms=data_config.transform(),
+        index_cache_dir=index_cache_dir,
+    )
+    return time.perf_counter() - start
+
+
+def main(config: experiment_config.FinetuneConfig):
+    cache_dir = tempfile.mkdtemp(prefix="gr00t_index_cache_")
+    try:
+        uncached = [build_dataset(config, None) for _ in range(REPEAT_NUM)]
+        cold = []
+        for _ in range(REPEAT_NUM):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(build_dataset(config, cache_dir))
+        warm = [build_dataset(config, cache_dir) for _ in range(REPEAT_NUM)]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    start = time.perf_counter()
+    dataset_fingerprint(config.dataset_path)
+    fingerprint_time = time.perf_counter() - start
+
+    print(f"dataset: {config.dataset_path}")
+    print(f"  {'no cache':>12}: {np.median(uncached) * 1000:9.1f} ms")
+    print(f"  {'cold cache':>12}: {np.median(cold) * 1000:9.1f} ms")
+    print(f"  {'warm cache':>12}: {np.median(warm) * 1000:9.1f} ms ({np.median(uncached) / np.median(warm):.1f}x faster, {fingerprint_time * 1000:.1f} ms of it fingerprinting)")
+
+
+if __name__ == "__main__":
+    main(experiment_config.from_cli(description="dataset startup time with and without the index cache").finetune)
@@ -0,0 +1,62 @@
+# load generator for the dynamic batching of run_inference_server, using StubPolicy so it runs on a CPU-only box
+# several client threads (one per "simulator") send /inference requests concurrently, once with batching off and once on
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import gr1_gr00t_utils
+import gr00t_server_utils
+
+
+CLIENT_NUM = 8
+REQUESTS_PER_CLIENT = 20
+MAX_BATCH_SIZE = 8
+MAX_BATCH_WAIT_MS = 5.0
+STUB_FIXED_LATENCY = 0.03 # seconds per forward pass
+STUB_PER_SAMPLE_LATENCY = 0.002 # seconds per sample in the batch
+HOST = "localhost"
+PORT = 9877
+TASK = "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl."
+
+
+def run_client(client_idx: int) -> list:
+    client = gr1_gr00t_utils.Gr00tInferenceClient(url=f"http://{HOST}:{PORT}/inference", wire_format="binary")
+    rng = np.random.default_rng(client_idx)
+    obs = rng.integers(0, 256, size=(200, 256, 3), dtype=np.uint8)
+    joint_positions = rng.normal(size=(54, ))
+    for _ in range(REQUESTS_PER_CLIENT):
+        client.infer(gr1_gr00t_utils.make_gr00t_input(task=TASK, obs=obs, joint_positions=joint_positions, as_json=False))
+    client.close()
+    return client.call_latencies
+
+
+def run_load(max_batch_size: int) -> dict:
+    policy = gr00t_server_utils.StubPolicy(fixed_latency=STUB_FIXED_LATENCY, per_sample_latency=STUB_PER_SAMPLE_LATENCY)
+    app = gr00t_server_utils.create_app(policy, max_batch_size=max_batch_size, max_wait_ms=MAX_BATCH_WAIT_MS, verbose=False)
+    server = gr00t_server_utils.serve_in_thread(app, host=HOST, port=PORT)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CLIENT_NUM) as executor:
+            latencies = np.concatenate([np.array(result) for result in executor.map(run_client, range(CLIENT_NUM))]) * 1000
+        elapsed = time.perf_counter() - start
+    finally:
+        gr00t_server_utils.stop_server(server)
+    return {
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_batch_size": app.state.metrics.mean_batch_size() if app.state.batcher is not None else 1.0,
+    }
+
+
+def main():
+    for max_batch_size in [1, MAX_BATCH_SIZE]:
+        result = run_load(max_batch_size)
+        print(
+            f"max_batch_size {max_batch_size:2d}: {result['throughput_rps']:7.1f} req/s  "
+            f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  mean batch {result['mean_batch_size']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
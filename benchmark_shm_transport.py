@@ -0,0 +1,40 @@
+# compares round-trip latency of the shared memory transport with http binary and the websocket stream,
+# all against the same StubPolicy server (zero latency, so only the transport is measured)
+
+import os
+import gr1_gr00t_utils
+import gr00t_server_utils
+from benchmark_streaming import make_payload, run_sequential, run_pipelined, report
+
+
+REQUEST_NUM = 500
+PIPELINE_DEPTH = 4
+HOST = "localhost"
+PORT = 9881
+SOCKET_PATH = f"/tmp/gr00t_benchmark_{os.getpid()}.sock"
+
+
+def main():
+    app = gr00t_server_utils.create_app(gr00t_server_utils.StubPolicy(fixed_latency=0.0, per_sample_latency=0.0, tokenizer_latency=0.0), shm_socket_path=SOCKET_PATH)
+    server = gr00t_server_utils.serve_in_thread(app, host=HOST, port=PORT)
+    payload = make_payload()
+    try:
+        client = gr1_gr00t_utils.Gr00tInferenceClient(url=f"http://{HOST}:{PORT}/inference", wire_format="binary")
+        report("http binary", client, run_sequential(client, payload, REQUEST_NUM), REQUEST_NUM)
+        client.close()
+
+        client = gr1_gr00t_utils.Gr00tStreamClient(url=f"ws://{HOST}:{PORT}/ws")
+        report("websocket", client, run_sequential(client, payload, REQUEST_NUM), REQUEST_NUM)
+        client.close()
+
+        client = gr1_gr00t_utils.Gr00tShmClient(socket_path=SOCKET_PATH, num_slots=PIPELINE_DEPTH)
+        report("shm", client, run_sequential(client, payload, REQUEST_NUM), REQUEST_NUM)
+        client.call_latencies.clear()
+        report(f"shm pipelined x{PIPELINE_DEPTH}", client, run_pipelined(client, payload, REQUEST_NUM, PIPELINE_DEPTH), REQUEST_NUM)
+        client.close()
+    finally:
+        gr00t_server_utils.stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
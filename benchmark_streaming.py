@@ -0,0 +1,74 @@
+# compares round-trip latency of the http /inference path and the websocket /ws stream against a StubPolicy server
+# the stream is measured one request at a time and with PIPELINE_DEPTH requests in flight
+
+import time
+import numpy as np
+import gr1_gr00t_utils
+import gr00t_server_utils
+
+
+REQUEST_NUM = 200
+PIPELINE_DEPTH = 4
+STUB_LATENCY = 0.0 # seconds per forward pass, 0 isolates the transport
+HOST = "localhost"
+PORT = 9880
+TASK = "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl."
+
+
+def make_payload() -> dict:
+    rng = np.random.default_rng(0)
+    obs = rng.integers(0, 256, size=(200, 256, 3), dtype=np.uint8)
+    return gr1_gr00t_utils.make_gr00t_input(task=TASK, obs=obs, joint_positions=rng.normal(size=(54, )), as_json=False)
+
+
+# make_payload, run_sequential, run_pipelined and report are shared with benchmark_shm_transport.py
+
+
+def run_sequential(client, payload: dict, request_num: int = REQUEST_NUM) -> float:
+    start = time.perf_counter()
+    for _ in range(request_num):
+        client.infer(payload)
+    return time.perf_counter() - start
+
+
+def run_pipelined(client, payload: dict, request_num: int = REQUEST_NUM, depth: int = PIPELINE_DEPTH) -> float:
+    """
+    client: anything with submit / receive, a Gr00tStreamClient or a Gr00tShmClient
+    """
+    start = time.perf_counter()
+    in_flight = [client.submit(payload) for _ in range(depth)]
+    for _ in range(request_num - depth):
+        client.receive(in_flight.pop(0))
+        in_flight.append(client.submit(payload))
+    for request_id in in_flight:
+        client.receive(request_id)
+    return time.perf_counter() - start
+
+
+def report(name: str, client, elapsed: float, request_num: int = REQUEST_NUM):
+    latencies = np.array(client.call_latencies[1:]) * 1000 # without the connection setup
+    print(f"{name:>22}: {request_num / elapsed:8.1f} req/s  p50 {np.percentile(latencies, 50):7.3f} ms  p95 {np.percentile(latencies, 95):7.3f} ms")
+
+
+def main():
+    app = gr00t_server_utils.create_app(gr00t_server_utils.StubPolicy(fixed_latency=STUB_LATENCY, per_sample_latency=0.0, tokenizer_latency=0.0))
+    server = gr00t_server_utils.serve_in_thread(app, host=HOST, port=PORT)
+    payload = make_payload()
+    try:
+        client = gr1_gr00t_utils.Gr00tInferenceClient(url=f"http://{HOST}:{PORT}/inference", wire_format="binary")
+        report("http binary", client, run_sequential(client, payload))
+        client.close()
+
+        client = gr1_gr00t_utils.Gr00tStreamClient(url=f"ws://{HOST}:{PORT}/ws")
+        report("websocket", client, run_sequential(client, payload))
+        client.close()
+
+        client = gr1_gr00t_utils.Gr00tStreamClient(url=f"ws://{HOST}:{PORT}/ws")
+        report(f"websocket pipelined x{PIPELINE_DEPTH}", client, run_pipelined(client, payload))
+        client.close()
+    finally:
+        gr00t_server_utils.stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# compares the serialize + deserialize cost of the json and binary /inference wire formats
+# needs only numpy, no server or simulator
+
+import json
+import time
+import numpy as np
+import gr00t_transport
+
+
+REPEAT = 50
+ACTION_HORIZON = 16
+STATE_SIZES = {"left_arm": 7, "right_arm": 7, "left_hand": 6, "right_hand": 6, "waist": 3}
+TASK = "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl. Pick up the yellow bowl and place it on the metallic measuring scale."
+
+
+def make_fake_request() -> tuple:
+    rng = np.random.default_rng(0)
+    obs = rng.integers(0, 256, size=(256, 256, 3), dtype=np.uint8)
+    state = {name: rng.normal(size=(size, )) for name, size in STATE_SIZES.items()}
+    actions = {f"action.{name}": rng.normal(size=(ACTION_HORIZON, size)).astype(np.float32) for name, size in STATE_SIZES.items()}
+    return obs, state, actions
+
+
+def json_round_trip(obs: np.ndarray, state: dict, actions: dict) -> tuple:
+    # client -> server
+    body = json.dumps({"task": TASK, "obs": obs.tolist(), "state": {k: v.tolist() for k, v in state.items()}})
+    request = json.loads(body)
+    decoded_obs = np.array(request["obs"], dtype=np.uint8)
+    # server -> client
+    body = json.dumps({k: v.tolist() for k, v in actions.items()})
+    decoded_actions = json.loads(body)
+    return decoded_obs, decoded_actions
+
+
+def binary_round_trip(obs: np.ndarray, state: dict, actions: dict) -> tuple:
+    body = gr00t_transport.encode_inference_request(TASK, obs, state)
+    _, decoded_obs, _ = gr00t_transport.decode_inference_request(body)
+    body = gr00t_transport.encode_actions(actions)
+    decoded_actions = gr00t_transport.decode_actions(body)
+    return decoded_obs, decoded_actions
+
+
+def measure(round_trip, obs: np.ndarray, state: dict, actions: dict) -> np.ndarray:
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        decoded_obs, _ = round_trip(obs, state, actions)
+        timings.append(time.perf_counter() - start)
+        assert np.array_equal(decoded_obs, obs)
+    return np.array(timings) * 1000
+
+
+def main():
+    obs, state, actions = make_fake_request()
+    print(f"json request size:   {len(json.dumps({'task': TASK, 'obs': obs.tolist()}))} bytes")
+    print(f"binary request size: {len(gr00t_transport.encode_inference_request(TASK, obs, state))} bytes")
+    for name, round_trip in [("json", json_round_trip), ("binary", binary_round_trip)]:
+        timings = measure(round_trip, obs, state, actions)
+        print(f"{name:>6}: mean {timings.mean():8.3f} ms  p50 {np.percentile(timings, 50):8.3f} ms  p95 {np.percentile(timings, 95):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
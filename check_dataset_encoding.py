@@ -1,52 +1,240 @@
+# this uses the gr00t conda environment
+# benchmarks the video backends of LeRobotSingleDataset on one dataset and recommends the fastest one that decodes the same frames
+# python check_dataset_encoding.py --preset NutPouring --workers 1 4 16 --recommendation results/video_backend.json
+# python run_finetune.py --preset NutPouring --config results/video_backend.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
 from gr00t.data.dataset import LeRobotSingleDataset
 from gr00t.experiment.data_config import DATA_CONFIG_MAP
 import matplotlib.pyplot as plt
 
+import experiment_config
+from dataset_index_cache import CachedIndexLeRobotDataset
+
 
-DATASET_PATH = "/media/daniel/new_disk/RFM/datasets/gr1_arms_only.Nut_pouring_task"
-EMBODIMENT_TAG = "gr1"
-#VIDEO_BACKEND = "decord"
-VIDEO_BACKEND = "torchvision_av"
-data_config = DATA_CONFIG_MAP["fourier_gr1_arms_only"]
+# the dataset is set in experiment_config.DatasetCheckConfig: --preset NutPouring|ExhaustPipe|PlateToCardboardBox, --set dataset_check.dataset_path=...
+CANDIDATE_BACKENDS = ("decord", "torchvision_av", "torchvision_video_reader", "torchcodec", "opencv")
+VIDEO_KEY = "video.ego_view"
+MAX_MEAN_ABS_DIFF = 2.0 # uint8 levels, decoders differ slightly in their yuv -> rgb conversion
 
 
-def main():
-    modality_config = data_config.modality_config()
-    dataset = LeRobotSingleDataset(
-        dataset_path=DATASET_PATH,
-        modality_configs=modality_config,
-        video_backend=VIDEO_BACKEND,
+def make_dataset(config: experiment_config.DatasetCheckConfig, video_backend: str) -> LeRobotSingleDataset:
+    # every backend and every worker builds its own dataset, the index and statistics are read once and then cached
+    return CachedIndexLeRobotDataset(
+        dataset_path=config.dataset_path,
+        modality_configs=DATA_CONFIG_MAP[config.embodiment_config].modality_config(),
+        video_backend=video_backend,
         video_backend_kwargs=None,
-        transforms=None, 
-        embodiment_tag=EMBODIMENT_TAG,
+        transforms=None,
+        embodiment_tag=config.embodiment_tag,
+        index_cache_dir=config.index_cache_dir,
     )
 
-    traj_id = 0
-    max_steps = 150
 
-    images = []
-    sample_images = 6
+def sample_steps(dataset: LeRobotSingleDataset, sample_num: int, seed: int) -> list:
+    """
+    random (trajectory id, step) pairs
+    """
+    rng = np.random.default_rng(seed)
+    trajectory_idxs = rng.integers(0, len(dataset.trajectory_ids), size=sample_num)
+    return [(int(dataset.trajectory_ids[idx]), int(rng.integers(0, dataset.trajectory_lengths[idx]))) for idx in trajectory_idxs]
 
-    for step_count in range(max_steps):
-        data_point = dataset.get_step_data(traj_id, step_count)
-        if step_count % (max_steps // sample_images) == 0:
-            image = data_point["video.ego_view"][0]
-            images.append(image)
 
+def decode_frame(dataset: LeRobotSingleDataset, trajectory_id: int, step: int) -> np.ndarray:
+    return dataset.get_step_data(trajectory_id, step)[VIDEO_KEY][0]
+
+
+def measure_backend(dataset: LeRobotSingleDataset, samples: list, sequential_steps: int) -> dict:
+    """
+    random-access and sequential get_step_data throughput, latency percentiles of a single frame decode
+    """
+    latencies = []
+    start = time.perf_counter()
+    for trajectory_id, step in samples:
+        call_start = time.perf_counter()
+        decode_frame(dataset, trajectory_id, step)
+        latencies.append(time.perf_counter() - call_start)
+    random_elapsed = time.perf_counter() - start
+
+    trajectory_id = int(dataset.trajectory_ids[0])
+    steps = min(sequential_steps, int(dataset.trajectory_lengths[0]))
+    start = time.perf_counter()
+    for step in range(steps):
+        decode_frame(dataset, trajectory_id, step)
+    sequential_elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "random_steps_per_s": len(samples) / random_elapsed,
+        "sequential_steps_per_s": steps / sequential_elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+_worker_dataset = None
+
+
+def _init_worker(config: experiment_config.DatasetCheckConfig, video_backend: str, barrier):
+    global _worker_dataset
+    _worker_dataset = make_dataset(config, video_backend)
+    barrier.wait() # the clock starts once every worker has built its dataset
+
+
+def _decode_samples(samples: list) -> int:
+    for trajectory_id, step in samples:
+        decode_frame(_worker_dataset, trajectory_id, step)
+    return len(samples)
 
-    # Plot the images in a row
-    fig, axes = plt.subplots(nrows=1, ncols=sample_images, figsize=(16, 4))
 
-    for i, ax in enumerate(axes):
-        ax.imshow(images[i])
+def measure_worker_scaling(config: experiment_config.DatasetCheckConfig, video_backend: str, samples: list, worker_counts: list) -> dict:
+    """
+    random-access throughput with N dataloader-like worker processes, each with its own dataset
+    """
+    context = multiprocessing.get_context("spawn")
+    scaling = {}
+    for worker_num in worker_counts:
+        barrier = context.Barrier(worker_num + 1)
+        with context.Pool(processes=worker_num, initializer=_init_worker, initargs=(config, video_backend, barrier)) as pool:
+            barrier.wait()
+            start = time.perf_counter()
+            decoded = sum(pool.imap_unordered(_decode_samples, [samples[idx::worker_num * 4] for idx in range(worker_num * 4)]))
+            scaling[str(worker_num)] = decoded / (time.perf_counter() - start)
+        print(f"  {video_backend:>24} x{worker_num:<3} workers: {scaling[str(worker_num)]:8.1f} steps/s")
+    return scaling
+
+
+def verify_frames(datasets: dict, samples: list) -> dict:
+    """
+    decodes the same steps with every backend and compares them with the first one (the configured, trusted backend)
+    backend -> {"mean_abs_diff", "max_abs_diff", "match"}
+    """
+    reference_backend = next(iter(datasets))
+    reference = [decode_frame(datasets[reference_backend], trajectory_id, step).astype(np.int16) for trajectory_id, step in samples]
+    verification = {}
+    for video_backend, dataset in datasets.items():
+        mean_diffs, max_diff, shape_match = [], 0, True
+        for (trajectory_id, step), reference_frame in zip(samples, reference):
+            frame = decode_frame(dataset, trajectory_id, step).astype(np.int16)
+            if frame.shape != reference_frame.shape:
+                shape_match = False
+                break
+            diff = np.abs(frame - reference_frame)
+            mean_diffs.append(float(diff.mean()))
+            max_diff = max(max_diff, int(diff.max()))
+        mean_abs_diff = float(np.mean(mean_diffs)) if mean_diffs else float("inf")
+        verification[video_backend] = {
+            "reference": reference_backend,
+            "mean_abs_diff": mean_abs_diff,
+            "max_abs_diff": max_diff,
+            "match": shape_match and mean_abs_diff <= MAX_MEAN_ABS_DIFF,
+        }
+    return verification
+
+
+def save_sample_images(dataset: LeRobotSingleDataset, path: str, sample_images: int = 6, max_steps: int = 150):
+    trajectory_id = int(dataset.trajectory_ids[0])
+    max_steps = min(max_steps, int(dataset.trajectory_lengths[0]))
+    images = [decode_frame(dataset, trajectory_id, step) for step in range(0, max_steps, max(1, max_steps // sample_images))][:sample_images]
+    # Plot the images in a row
+    fig, axes = plt.subplots(nrows=1, ncols=len(images), figsize=(16, 4))
+    for image, ax in zip(images, np.atleast_1d(axes)):
+        ax.imshow(image)
         ax.axis("off")
-        
-        
     # Save to file
-    plt.savefig("dataset_images.png", bbox_inches="tight", dpi=300)
-    plt.close(fig) 
-    print("Images saved as: dataset_images.png")
-        
-        
+    plt.savefig(path, bbox_inches="tight", dpi=300)
+    plt.close(fig)
+    print(f"Images saved as: {path}")
+
+
+def main(config: experiment_config.DatasetCheckConfig, args: argparse.Namespace):
+    datasets = {}
+    unavailable = {}
+    for video_backend in args.backends:
+        try:
+            dataset = make_dataset(config, video_backend)
+            decode_frame(dataset, int(dataset.trajectory_ids[0]), 0)
+            datasets[video_backend] = dataset
+        except Exception as error: # not installed or cannot decode this dataset's codec
+            unavailable[video_backend] = repr(error)
+            print(f"{video_backend}: unavailable ({error})")
+    if not datasets:
+        raise RuntimeError("no video backend can decode this dataset")
+
+    samples = sample_steps(next(iter(datasets.values())), args.samples, seed=0)
+    verification = verify_frames(datasets, samples[:args.verify_samples])
+    results = {}
+    for video_backend, dataset in datasets.items():
+        decode_frame(dataset, *samples[0]) # warm up
+        results[video_backend] = measure_backend(dataset, samples, args.sequential_steps)
+        stats = results[video_backend]
+        print(f"{video_backend:>24}: random {stats['random_steps_per_s']:8.1f} steps/s  sequential {stats['sequential_steps_per_s']:8.1f} steps/s  "
+              f"p50 {stats['latency_p50_ms']:7.2f} ms  p95 {stats['latency_p95_ms']:7.2f} ms  p99 {stats['latency_p99_ms']:7.2f} ms  "
+              f"frames {'match' if verification[video_backend]['match'] else 'DIFFER'} (mean abs diff {verification[video_backend]['mean_abs_diff']:.2f})")
+    if args.workers:
+        print("worker scaling (random access):")
+        for video_backend in datasets:
+            results[video_backend]["workers_steps_per_s"] = measure_worker_scaling(config, video_backend, samples, args.workers)
+
+    # the fastest backend among those returning the reference frames, at the worker count closest to the fine-tuning dataloader
+    target_workers = min(args.workers, key=lambda worker_num: abs(worker_num - args.dataloader_workers)) if args.workers else None
+    def throughput(video_backend: str) -> float:
+        if target_workers is not None:
+            return results[video_backend]["workers_steps_per_s"][str(target_workers)]
+        return results[video_backend]["random_steps_per_s"]
+    verified = [video_backend for video_backend in datasets if verification[video_backend]["match"]]
+    recommended = max(verified, key=throughput)
+    rejected = [video_backend for video_backend in datasets if video_backend not in verified and throughput(video_backend) > throughput(recommended)]
+    print(f"recommended video backend: {recommended} ({throughput(recommended):.1f} steps/s)")
+    for video_backend in rejected:
+        print(f"  {video_backend} is faster ({throughput(video_backend):.1f} steps/s) but decodes different frames, not recommended")
+
+    report = {
+        "dataset_path": config.dataset_path,
+        "recommended": recommended,
+        "target_workers": target_workers,
+        "results": results,
+        "verification": verification,
+        "unavailable": unavailable,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    # an experiment_config override file: python run_finetune.py --config <recommendation>
+    os.makedirs(os.path.dirname(os.path.abspath(args.recommendation)), exist_ok=True)
+    with open(args.recommendation, "w") as f:
+        json.dump({"finetune": {"video_backend": recommended}}, f, indent=2)
+    print(f"Report saved as: {args.report}, recommendation as: {args.recommendation}")
+
+    if args.save_images:
+        save_sample_images(datasets[recommended], config.output_image)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="benchmark the video backends of a LeRobot dataset and recommend one for fine-tuning")
+    experiment_config.add_arguments(parser)
+    parser.add_argument("--backends", nargs="+", default=None, help="backends to try, the first one is the reference for the frame check (default: dataset_check.video_backend, then the other candidates)")
+    parser.add_argument("--samples", type=int, default=200, help="random (trajectory, step) samples per measurement")
+    parser.add_argument("--sequential-steps", type=int, default=150)
+    parser.add_argument("--verify-samples", type=int, default=20, help="steps decoded by every backend and compared")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4, 16], help="worker process counts for the scaling test, none to skip it")
+    parser.add_argument("--dataloader-workers", type=int, default=None, help="worker count to optimize for (default: finetune.dataloader_num_workers)")
+    parser.add_argument("--report", default=None, help="full results (default: ./results/<name>_video_backends.json)")
+    parser.add_argument("--recommendation", default=None, help="config override file for run_finetune.py (default: ./results/<name>_video_backend.json)")
+    parser.add_argument("--save-images", action="store_true", help="also save a strip of decoded frames as dataset_check.output_image")
+    args = parser.parse_args()
+    try:
+        config = experiment_config.config_from_args(args)
+    except (ValueError, OSError) as error:
+        parser.error(str(error))
+    args.backends = args.backends or [config.dataset_check.video_backend] + [video_backend for video_backend in CANDIDATE_BACKENDS if video_backend != config.dataset_check.video_backend]
+    args.dataloader_workers = args.dataloader_workers or config.finetune.dataloader_num_workers
+    args.report = args.report or f"./results/{config.name}_video_backends.json"
+    args.recommendation = args.recommendation or f"./results/{config.name}_video_backend.json"
+    main(config.dataset_check, args)
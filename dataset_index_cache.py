@@ -0,0 +1,147 @@
+# this uses the gr00t conda environment
+
+import hashlib
+import os
+import pickle
+import time
+from gr00t.data.dataset import LeRobotSingleDataset
+
+from frame_cache_dataset import FrameCachedLeRobotDataset
+
+
+# on-disk cache of what LeRobotSingleDataset builds at construction: metadata (modalities + normalization statistics),
+# trajectory ids / lengths and the (trajectory, step) index
+# entries are keyed by the dataset path and the dataset configuration, and are only valid for one content fingerprint
+# (size and mtime of meta/* and data/**/*.parquet), so any changed, added or removed file invalidates them
+# videos are not part of the fingerprint, nothing cached here is derived from them
+
+DEFAULT_CACHE_DIR = "~/.cache/gr00t_dataset_index"
+
+
+def dataset_fingerprint(dataset_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for sub_dir in ("meta", "data"):
+        for root, dirs, files in os.walk(os.path.join(dataset_path, sub_dir)):
+            dirs.sort()
+            for file_name in sorted(files):
+                if sub_dir == "data" and not file_name.endswith(".parquet"):
+                    continue
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                digest.update(f"{os.path.relpath(path, dataset_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DatasetIndexCache:
+    """
+    one cache entry (a pickled dict of named values) of one dataset configuration
+    get(name, compute) returns the cached value or computes it; save() writes the entry if anything was computed
+    """
+    def __init__(self, cache_dir: str, dataset_path: str, config_key: str = ""):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.dataset_path = os.path.abspath(dataset_path)
+        self.key = hashlib.blake2b(f"{self.dataset_path}\n{config_key}".encode("utf-8"), digest_size=12).hexdigest()
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.fingerprint = dataset_fingerprint(self.dataset_path)
+        self.values = self._load()
+        self.hit = bool(self.values)
+        self.computed = False
+
+    def _entry_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.key}_{fingerprint}.pkl")
+
+    def _load(self) -> dict:
+        try:
+            with open(self._entry_path(self.fingerprint), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return {}
+
+    def get(self, name: str, compute):
+        if name in self.values:
+            return self.values[name]
+        value = compute()
+        self.values[name] = value
+        self.computed = True
+        return value
+
+    def save(self):
+        """
+        the fingerprint is taken again: building the dataset may have written files itself (e.g. meta/stats.json)
+        entries of the same dataset configuration written before this one was started are removed, those saved
+        meanwhile by concurrent processes (which may have seen another fingerprint) are kept
+        """
+        if not self.computed:
+            return
+        fingerprint = dataset_fingerprint(self.dataset_path)
+        path = self._entry_path(fingerprint)
+        # atomic, concurrent sweep processes may save the same entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self.values, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as error: # the dataset is built, only the next startup stays cold
+            print(f"dataset index cache not saved: {error!r}")
+            return
+        for file_name in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, file_name)
+            if not file_name.startswith(f"{self.key}_") or not file_name.endswith(".pkl") or entry_path == path:
+                continue
+            try:
+                if os.stat(entry_path).st_mtime < self.started_at:
+                    os.unlink(entry_path)
+            except OSError: # removed by another process
+                pass
+        self.fingerprint = fingerprint
+
+    def report(self):
+        print(f"dataset index cache {'warm' if self.hit and not self.computed else 'cold'}: {self.dataset_path} ready in {time.perf_counter() - self.start:.2f}s")
+
+
+class CachedIndexMixin:
+    """
+    put in front of LeRobotSingleDataset (or a subclass): metadata, trajectories and the step index come from a
+    DatasetIndexCache in index_cache_dir, None turns the cache off
+    the cache is dropped after construction, a step index built lazily later (dataset_mixture.py) is not cached
+    """
+    def __init__(self, *args, index_cache_dir: str = DEFAULT_CACHE_DIR, **kwargs):
+        self._index_cache = None
+        if index_cache_dir is not None:
+            dataset_path = kwargs["dataset_path"] if "dataset_path" in kwargs else args[0]
+            modality_configs = kwargs.get("modality_configs")
+            config_key = f"{kwargs.get('embodiment_tag')}\n{sorted((key, repr(value)) for key, value in (modality_configs or {}).items())}"
+            self._index_cache = DatasetIndexCache(index_cache_dir, str(dataset_path), config_key)
+        super().__init__(*args, **kwargs)
+        if self._index_cache is not None:
+            self._index_cache.save()
+            self._index_cache.report()
+            self._index_cache = None # nothing to hand to dataloader workers
+
+    def _cached(self, name: str, compute):
+        if self._index_cache is None:
+            return compute()
+        return self._index_cache.get(name, compute)
+
+    def _get_metadata(self, embodiment_tag):
+        return self._cached("metadata", lambda: super(CachedIndexMixin, self)._get_metadata(embodiment_tag))
+
+    def _get_trajectories(self):
+        return self._cached("trajectories", lambda: super(CachedIndexMixin, self)._get_trajectories())
+
+    def _get_all_steps(self):
+        return self._cached("all_steps", lambda: super(CachedIndexMixin, self)._get_all_steps())
+
+
+class CachedIndexLeRobotDataset(CachedIndexMixin, LeRobotSingleDataset):
+    """
+    LeRobotSingleDataset with a cached index and statistics
+    """
+
+
+class CachedIndexFrameCachedDataset(CachedIndexMixin, FrameCachedLeRobotDataset):
+    """
+    cached index and statistics, frames from a frame cache (frame_cache.py)
+    """
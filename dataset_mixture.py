@@ -0,0 +1,122 @@
+# this uses the gr00t conda environment
+
+import os
+import time
+import numpy as np
+from gr00t.data.dataset import LeRobotSingleDataset, LeRobotMixtureDataset
+
+from frame_cache_dataset import FrameCachedLeRobotDataset
+from dataset_index_cache import DEFAULT_CACHE_DIR, CachedIndexMixin
+
+
+# multi-dataset training for run_finetune.py: weighted sampling over several LeRobot datasets with shared normalization
+# statistics (LeRobotMixtureDataset merges the statistics of datasets of the same embodiment and hands them to every transform)
+
+
+class LazyIndexLeRobotDataset(CachedIndexMixin, LeRobotSingleDataset):
+    """
+    LeRobotSingleDataset that builds its (trajectory, step) list only when it is used
+    the mixture samples trajectories and steps from trajectory_lengths directly, so with several datasets
+    the per-step lists of every episode are never built at startup
+    metadata and trajectories come from the index cache (dataset_index_cache.py)
+    """
+    def _get_all_steps(self):
+        return None
+
+    @property
+    def all_steps(self) -> list:
+        if self._all_steps is None:
+            self._all_steps = super()._get_all_steps()
+        return self._all_steps
+
+    def __len__(self) -> int:
+        return int(np.sum(self.trajectory_lengths))
+
+
+class LazyIndexFrameCachedDataset(LazyIndexLeRobotDataset, FrameCachedLeRobotDataset):
+    """
+    lazy index and frames from a frame cache (frame_cache.py)
+    """
+
+
+class MonitoredMixtureDataset(LeRobotMixtureDataset):
+    """
+    LeRobotMixtureDataset that times every sample per source dataset and prints the throughput of each dataset
+    every log_every samples (per dataloader worker), a slow dataset holding back the mixture stands out
+    """
+    def __init__(self, *args, dataset_names: list, log_every: int = 2000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dataset_names = dataset_names
+        self.log_every = log_every
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.sample_counts = np.zeros(len(self.datasets), dtype=np.int64)
+        self.sample_times = np.zeros(len(self.datasets), dtype=float)
+        self.window_start = time.perf_counter()
+
+    def __getitem__(self, index: int) -> dict:
+        start = time.perf_counter()
+        dataset, trajectory_id, step = self.sample_step(index)
+        data = dataset.transforms(dataset.get_step_data(trajectory_id, step))
+        dataset_idx = self.datasets.index(dataset)
+        self.sample_counts[dataset_idx] += 1
+        self.sample_times[dataset_idx] += time.perf_counter() - start
+        if self.sample_counts.sum() >= self.log_every:
+            self.log_throughput()
+        return data
+
+    def throughput(self) -> dict:
+        """
+        dataset name -> samples, share of the samples, samples/s while loading it, mean ms per sample
+        """
+        total = max(int(self.sample_counts.sum()), 1)
+        return {
+            name: {
+                "samples": int(count),
+                "share": count / total,
+                "samples_per_s": count / seconds if seconds > 0 else 0.0,
+                "mean_ms": seconds / count * 1000 if count else 0.0,
+            }
+            for name, count, seconds in zip(self.dataset_names, self.sample_counts, self.sample_times)
+        }
+
+    def log_throughput(self):
+        elapsed = time.perf_counter() - self.window_start
+        print(f"[mixture pid {os.getpid()}] {int(self.sample_counts.sum())} samples in {elapsed:.1f}s")
+        for name, stats in self.throughput().items():
+            print(f"  {name:>40}: {stats['samples']:6d} samples ({stats['share'] * 100:5.1f}%)  {stats['samples_per_s']:8.1f} samples/s  {stats['mean_ms']:7.2f} ms/sample")
+        self._reset_stats()
+
+
+def make_mixture_dataset(dataset_specs: list, data_config, embodiment_tag, video_backend: str, balance_dataset_weights: bool = True, log_every: int = 2000, index_cache_dir: str = DEFAULT_CACHE_DIR) -> MonitoredMixtureDataset:
+    """
+    dataset_specs: experiment_config.DatasetSpec list (path, weight, optional frame_cache_dir)
+    data_config: entry of DATA_CONFIG_MAP, every dataset gets its own transform instance
+    balance_dataset_weights: weights are multiplied by the dataset lengths (weight 1.0 everywhere = uniform over all steps)
+    index_cache_dir: dataset_index_cache.py cache directory, None turns it off
+    """
+    data_mixture = []
+    for spec in dataset_specs:
+        dataset_kwargs = dict(
+            dataset_path=spec.path,
+            modality_configs=data_config.modality_config(),
+            embodiment_tag=embodiment_tag,
+            video_backend=video_backend,
+            video_backend_kwargs=None,
+            transforms=data_config.transform(),
+            index_cache_dir=index_cache_dir,
+        )
+        if spec.frame_cache_dir is not None:
+            dataset = LazyIndexFrameCachedDataset(frame_cache_dirs={"video.ego_view": spec.frame_cache_dir}, **dataset_kwargs)
+        else:
+            dataset = LazyIndexLeRobotDataset(**dataset_kwargs)
+        data_mixture.append((dataset, spec.weight))
+    return MonitoredMixtureDataset(
+        data_mixture,
+        mode="train",
+        balance_dataset_weights=balance_dataset_weights,
+        balance_trajectory_weights=True,
+        dataset_names=[os.path.basename(os.path.normpath(spec.path)) for spec in dataset_specs],
+        log_every=log_every,
+    )
@@ -0,0 +1,452 @@
+import argparse
+import dataclasses
+import json
+import typing
+from dataclasses import dataclass, field
+
+
+# typed configuration shared by run_simulation.py, run_batch_evaluation.py, run_inference_server.py, run_finetune.py and check_dataset_encoding.py
+# only stdlib imports (yaml is imported when a YAML file is read), so it loads in every conda environment
+# python run_simulation.py --preset ExhaustPipe --config sweep.yaml --set name=pipe_h8 --set simulation.execution.replan_horizon=8
+# "{name}" in any string field is replaced by the experiment name, so concurrent runs with different names do not share output files
+# or shared memory sockets; ports cannot be derived from the name, concurrent servers need their own port:
+# --set server.port=9877 --set simulation.inference.server_url=http://localhost:9877/inference --set simulation.inference.stream_url=ws://localhost:9877/ws
+
+MODEL_DIR = "/media/daniel/new_disk/RFM/models"
+DATASET_DIR = "/media/daniel/new_disk/RFM/datasets"
+
+
+@dataclass
+class CameraConfig:
+    height: int = 200 # width is fixed to 256
+    focal_length: float = 1.2 # smaller => wider range of view
+    forward_dist: float = 0.25
+    angle: float = 70.0
+
+
+@dataclass
+class VideoConfig:
+    file: str = "./results/{name}.mp4"
+    every_k_frames: int = 1 # record every k-th frame only
+    scale: float = 1.0 # resolution factor of the recorded video
+    queue_size: int = 64 # frames waiting for the background encoder
+    drop_policy: str = "block" # "block", "drop_newest" or "drop_oldest" when the encoder falls behind
+
+
+@dataclass
+class InferenceClientConfig:
+    transport: str = "http" # "http" (one request per chunk), "websocket" (persistent stream, always binary) or "shm" (shared memory, server on the same host)
+    server_url: str = "http://localhost:9876/inference"
+    stream_url: str = "ws://localhost:9876/ws"
+    shm_socket: str = "/tmp/gr00t_{name}.sock" # server.shm_socket_path of the inference server
+    wire_format: str = "binary" # "binary" sends raw frame bytes, "json" sends nested lists (slow)
+    timeout: float = 10.0 # seconds
+    retries: int = 3
+    prefetch_enabled: bool = False # pipelined mode: the next observation is sent while the current chunk is still executing
+    prefetch_step: int = 8 # timestep within the replan cycle at which the next request is sent (at the latest one step before its end)
+
+
+@dataclass
+class ExecutionConfig:
+    substeps: int = 1 # physics steps per chunk row, interpolated in between (action_executor.ActionExecutor)
+    ensemble_decay: float = 0.01 # overlapping chunks are blended with weights exp(-ensemble_decay * i), i = 0 for the oldest chunk
+    replan_horizon: int = 16 # chunk rows (1-16) executed before the next inference, < 16 opts in to overlapping chunks (ensembled)
+    adaptive_horizon: bool = False # action_executor.AdaptiveHorizon
+    adaptive_horizon_min: int = 4
+    adaptive_horizon_max: int = 16
+    adaptive_latency_budget_ms: float = 100.0
+    adaptive_tracking_tolerance: float = 0.05 # rad, mean over the gr00t joints
+
+
+@dataclass
+class TraceConfig:
+    enabled: bool = False # per-stage timing of the control loop
+    output_prefix: str = "./results/{name}_loop_trace" # writes <prefix>_chrome.json, <prefix>_summary.json and <prefix>.csv
+
+
+@dataclass
+class RecordConfig:
+    enabled: bool = False # record rollouts as a LeRobot dataset (lerobot_recorder.LeRobotRecorder), loadable by run_finetune.py
+    root: str = "./results/{name}_rollouts" # several processes may record into the same root
+    fps: float = 30.0
+
+
+@dataclass
+class SimulationConfig:
+    backend: str = "isaacsim" # "isaacsim", or "fake" for the numpy stand-in (no GPU needed)
+    headless: bool = False
+    episode_num: int = 2
+    episode_len: int = 30
+    world_file: str = "./environments/gr1_NutPouring.usd"
+    task: str = ""
+    # initial-state noise of a seeded episode (run_batch_evaluation.py seeds), see gr1_env.IsaacSimGr1Env
+    initial_joint_noise: float = 0.01 # rad, std
+    object_prims: typing.List[str] = field(default_factory=list) # prims whose start position is perturbed, e.g. "/World/beaker"
+    object_position_noise: float = 0.02 # m, max xy offset
+    camera: CameraConfig = field(default_factory=CameraConfig)
+    video: VideoConfig = field(default_factory=VideoConfig)
+    inference: InferenceClientConfig = field(default_factory=InferenceClientConfig)
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
+    trace: TraceConfig = field(default_factory=TraceConfig)
+    record: RecordConfig = field(default_factory=RecordConfig)
+
+
+@dataclass
+class EvaluationConfig:
+    # run_batch_evaluation.py: every scene x seed is one episode of the simulation config (headless)
+    process_num: int = 4 # simulator processes, one scene each at a time
+    scenes: typing.List[str] = field(default_factory=list) # USD files, empty runs simulation.world_file only
+    seeds: typing.List[int] = field(default_factory=lambda: [0, 1])
+    result_dir: str = "./results/{name}_batch_evaluation" # summary.json and the videos
+    save_video: bool = True
+    video_every_k_frames: int = 2 # evaluation videos do not need the full frame rate
+
+
+@dataclass
+class ServerConfig:
+    model_path: str = ""
+    embodiment_tag: str = "gr1"
+    embodiment_config: str = "fourier_gr1_arms_only"
+    device: str = "cuda"
+    host: str = "localhost"
+    port: int = 9876 # one per concurrently running server, see the top of this file
+    max_batch_size: int = 8 # dynamic batching of concurrent /inference requests, 1 turns it off
+    max_batch_wait_ms: float = 5.0
+    profile_dir: str = "./results/{name}_server_profile" # POST /profile writes here
+    action_cache_size: int = 0 # only for a deterministic policy, 0 turns it off
+    action_cache_ttl: float = 600.0 # seconds
+    task_cache_size: int = 64 # tokenizations of task texts, 0 turns it off
+    shm_socket_path: typing.Optional[str] = None # same-host shared memory transport, e.g. "/tmp/gr00t_{name}.sock" (simulation.inference.shm_socket), None turns it off
+
+
+@dataclass
+class DatasetSpec:
+    path: str = ""
+    weight: float = 1.0 # sampling weight in the mixture
+    frame_cache_dir: typing.Optional[str] = None # pre-decoded frames of this dataset (frame_cache.py)
+
+
+@dataclass
+class FinetuneConfig:
+    pretrained_model_path: str = "nvidia/GR00T-N1.5-3B"
+    embodiment_tag: str = "gr1"
+    embodiment_config: str = "fourier_gr1_arms_only"
+    tune_llm: bool = False # backbone's LLM
+    tune_visual: bool = False # backbone's vision tower
+    tune_projector: bool = True # action head's projector
+    tune_diffusion_model: bool = False # action head's DiT
+    dataset_path: str = ""
+    video_backend: str = "decord" # torchvision_av #this is important!
+    frame_cache_dir: typing.Optional[str] = None # pre-decoded frames of dataset_path (frame_cache.py), replaces video decoding
+    index_cache_dir: typing.Optional[str] = "~/.cache/gr00t_dataset_index" # cached index and statistics of every dataset (dataset_index_cache.py), None turns it off
+    # multi-dataset training, replaces dataset_path when set: --set 'finetune.datasets=[{path: /a, weight: 1.0}, {path: /b, weight: 0.5}]'
+    datasets: typing.List[DatasetSpec] = field(default_factory=list)
+    balance_dataset_weights: bool = True # weights are multiplied by the dataset lengths
+    mixture_log_every: int = 2000 # samples per dataloader worker between per-dataset throughput logs
+    compute_dtype: str = "bfloat16"
+    output_dir: str = ""
+    batch_size: int = 32
+    max_steps: int = 40000
+    save_steps: int = 10000 # save the model in this steps
+    gradient_accumulation_steps: int = 4
+    dataloader_num_workers: int = 16
+    learning_rate: float = 1e-4
+    run_name: str = "{name}" # for reporting to wandb
+
+
+@dataclass
+class DatasetCheckConfig:
+    dataset_path: str = ""
+    embodiment_tag: str = "gr1"
+    embodiment_config: str = "fourier_gr1_arms_only"
+    video_backend: str = "torchvision_av" # reference backend of the frame check in check_dataset_encoding.py
+    output_image: str = "dataset_images.png"
+    index_cache_dir: typing.Optional[str] = "~/.cache/gr00t_dataset_index" # dataset_index_cache.py, None turns it off
+
+
+@dataclass
+class ExperimentConfig:
+    name: str = "experiment"
+    simulation: SimulationConfig = field(default_factory=SimulationConfig)
+    evaluation: EvaluationConfig = field(default_factory=EvaluationConfig)
+    server: ServerConfig = field(default_factory=ServerConfig)
+    finetune: FinetuneConfig = field(default_factory=FinetuneConfig)
+    dataset_check: DatasetCheckConfig = field(default_factory=DatasetCheckConfig)
+
+
+def _nut_pouring() -> dict:
+    return {
+        "name": "NutPouring",
+        "simulation": {
+            "world_file": "./environments/gr1_NutPouring.usd",
+            "task": "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl. Pick up the yellow bowl and place it on the metallic measuring scale.",
+        },
+        "evaluation": {
+            "scenes": [
+                "./environments/gr1_NutPouring.usd",
+                "./environments/gr1_NutPouring_changedColor.usd",
+                "./environments/gr1_NutPouring_changedLight.usd",
+                "./environments/gr1_NutPouring_changedPosition.usd",
+            ],
+        },
+        "server": {"model_path": f"{MODEL_DIR}/gr1_arms_only.Nut_pouring_batch32_nodiffusion/checkpoint-10000"},
+        "finetune": {
+            "dataset_path": f"{DATASET_DIR}/gr1_arms_only.Nut_pouring_task",
+            "output_dir": f"{MODEL_DIR}/gr1_arms_only.Nut_pouring_batch32_nodiffusion",
+            "run_name": "gr1_arms_only.Nut_pouring_batch32_nodiffusion",
+        },
+        "dataset_check": {"dataset_path": f"{DATASET_DIR}/gr1_arms_only.Nut_pouring_task"},
+    }
+
+
+def _exhaust_pipe() -> dict:
+    return {
+        "name": "ExhaustPipe",
+        "simulation": {
+            "world_file": "./environments/gr1_exhaust_pipe.usd",
+            "task": "Pickup the blue pipe and place it into the blue bin.",
+            "camera": {"forward_dist": 0.25, "angle": 70.0},
+        },
+        "server": {"model_path": f"{MODEL_DIR}/gr1_arms_only.Exhaust_pipe_sort_batch32_nodiffusion/checkpoint-40000"},
+        "finetune": {
+            "dataset_path": f"{DATASET_DIR}/gr1_arms_only.Exhaust_pipe_sorting_task",
+            "output_dir": f"{MODEL_DIR}/gr1_arms_only.Exhaust_pipe_sort_batch32_nodiffusion",
+            "run_name": "gr1_arms_only.Exhaust_pipe_sort_batch32_nodiffusion",
+        },
+        "dataset_check": {"dataset_path": f"{DATASET_DIR}/gr1_arms_only.Exhaust_pipe_sorting_task"},
+    }
+
+
+def _plate_to_cardboard_box() -> dict:
+    # prompt and camera from from_scratch/gr1_gr00t_PlateToCardboardBox.py
+    # no model or dataset of this task exists yet, their paths follow the naming of the other presets
+    return {
+        "name": "PlateToCardboardBox",
+        "simulation": {
+            "world_file": "./environments/gr1_PlateToCardboardBox.usd",
+            "task": "pick the green cube and place it in the cardboard box",
+            "camera": {"focal_length": 1.0, "forward_dist": 0.13, "angle": 60.0},
+        },
+        "server": {"model_path": f"{MODEL_DIR}/gr1_arms_only.Plate_to_cardboard_box_batch32_nodiffusion/checkpoint-30000"},
+        "finetune": {
+            "dataset_path": f"{DATASET_DIR}/gr1_arms_only.Plate_to_cardboard_box_task",
+            "output_dir": f"{MODEL_DIR}/gr1_arms_only.Plate_to_cardboard_box_batch32_nodiffusion",
+            "run_name": "gr1_arms_only.Plate_to_cardboard_box_batch32_nodiffusion",
+        },
+        "dataset_check": {"dataset_path": f"{DATASET_DIR}/gr1_arms_only.Plate_to_cardboard_box_task"},
+    }
+
+
+def _exhaust_pipe_plus_nut_pouring() -> dict:
+    # one policy for both tasks, trained on the mixture of both datasets (evaluated in either scene)
+    config = _nut_pouring()
+    config["name"] = "ExhaustPipePlusNutPouring"
+    config["server"] = {"model_path": f"{MODEL_DIR}/gr1_arms_only.Exhaust_pipe_plus_Nut_pouring_batch32/checkpoint-40000"}
+    config["finetune"] = {
+        "datasets": [
+            {"path": f"{DATASET_DIR}/gr1_arms_only.Exhaust_pipe_sorting_task", "weight": 1.0},
+            {"path": f"{DATASET_DIR}/gr1_arms_only.Nut_pouring_task", "weight": 1.0},
+        ],
+        "output_dir": f"{MODEL_DIR}/gr1_arms_only.Exhaust_pipe_plus_Nut_pouring_batch32",
+        "run_name": "gr1_arms_only.Exhaust_pipe_plus_Nut_pouring_batch32",
+    }
+    return config
+
+
+PRESETS = {
+    "NutPouring": _nut_pouring,
+    "ExhaustPipe": _exhaust_pipe,
+    "PlateToCardboardBox": _plate_to_cardboard_box,
+    "ExhaustPipePlusNutPouring": _exhaust_pipe_plus_nut_pouring,
+}
+DEFAULT_PRESET = "NutPouring"
+
+# fields that only take a few values, checked whenever they are set from a preset, a file or --set
+CHOICES = {
+    "simulation.backend": ("isaacsim", "fake"),
+    "simulation.video.drop_policy": ("block", "drop_newest", "drop_oldest"),
+    "simulation.inference.transport": ("http", "websocket", "shm"),
+    "simulation.inference.wire_format": ("binary", "json"),
+}
+
+
+def _coerce(value, field_type, path: str):
+    """
+    converts a YAML / CLI value to the declared field type, raises ValueError when it does not fit
+    """
+    if typing.get_origin(field_type) is typing.Union: # Optional[...]
+        if value is None:
+            return None
+        field_type = next(arg for arg in typing.get_args(field_type) if arg is not type(None))
+    if typing.get_origin(field_type) is list:
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{path}: expected a list, got {value!r}")
+        (item_type, ) = typing.get_args(field_type)
+        if dataclasses.is_dataclass(item_type):
+            return [apply_overrides(item_type(), item, prefix=f"{path}[{idx}].") if isinstance(item, dict) else _coerce(item, item_type, f"{path}[{idx}]") for idx, item in enumerate(value)]
+        return [_coerce(item, item_type, f"{path}[{idx}]") for idx, item in enumerate(value)]
+    if field_type is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false", "1", "0", "yes", "no"):
+            return value.lower() in ("true", "1", "yes")
+    elif field_type is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                pass
+    elif field_type is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str): # YAML 1.1 reads 1e-4 (no dot in the mantissa) as a string
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    elif field_type is str:
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return str(value)
+    raise ValueError(f"{path}: expected {getattr(field_type, '__name__', field_type)}, got {value!r}")
+
+
+def apply_overrides(config, overrides: dict, prefix: str = ""):
+    """
+    writes a nested dict of values into the (nested) dataclass config in place
+    """
+    field_types = typing.get_type_hints(type(config))
+    for key, value in overrides.items():
+        path = f"{prefix}{key}"
+        if key not in field_types:
+            raise ValueError(f"unknown config field: {path} (known: {', '.join(field_types)})")
+        if dataclasses.is_dataclass(field_types[key]):
+            if not isinstance(value, dict):
+                raise ValueError(f"{path}: expected a mapping, got {value!r}")
+            apply_overrides(getattr(config, key), value, prefix=f"{path}.")
+        else:
+            value = _coerce(value, field_types[key], path)
+            if path in CHOICES and value not in CHOICES[path]:
+                raise ValueError(f"{path}: expected one of {', '.join(CHOICES[path])}, got {value!r}")
+            setattr(config, key, value)
+    return config
+
+
+def _parse_value(text: str):
+    try:
+        import yaml
+        return yaml.safe_load(text)
+    except ImportError:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+
+def _field_type(keys: list):
+    """
+    declared type of a dotted ExperimentConfig field, None when there is no such field
+    """
+    field_type = ExperimentConfig
+    for key in keys:
+        if not dataclasses.is_dataclass(field_type):
+            return None
+        field_type = typing.get_type_hints(field_type).get(key)
+    return field_type
+
+
+def parse_override(text: str) -> dict:
+    """
+    "simulation.camera.height=180" -> {"simulation": {"camera": {"height": 180}}}
+    the value is parsed as YAML, except for str fields which take the text as it is (task prompts are free text)
+    """
+    if "=" not in text:
+        raise ValueError(f"expected key=value, got {text!r}")
+    dotted_key, value = text.split("=", 1)
+    keys = dotted_key.strip().split(".")
+    field_type = _field_type(keys)
+    if field_type is str or (field_type == typing.Optional[str] and value.strip() not in ("null", "~")):
+        override = value
+    else:
+        override = _parse_value(value)
+    for key in reversed(keys):
+        override = {key: override}
+    return override
+
+
+def read_config_file(path: str) -> dict:
+    """
+    YAML (or JSON) file with a nested mapping of fields, may name a base preset with "preset: <name>"
+    """
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return json.loads(text)
+    import yaml
+    return yaml.safe_load(text) or {}
+
+
+def _expand_name(config, name: str):
+    for config_field in dataclasses.fields(config):
+        value = getattr(config, config_field.name)
+        if dataclasses.is_dataclass(value):
+            _expand_name(value, name)
+        elif isinstance(value, str) and "{name}" in value:
+            setattr(config, config_field.name, value.replace("{name}", name))
+        elif isinstance(value, list):
+            for item in value:
+                if dataclasses.is_dataclass(item):
+                    _expand_name(item, name)
+
+
+def load_config(preset: str = None, config_files: list = (), overrides: list = (), default_preset: str = DEFAULT_PRESET) -> ExperimentConfig:
+    """
+    defaults < preset < config files (in order) < "key=value" overrides
+    preset: one of PRESETS, by default the preset named in the config files or default_preset
+    """
+    file_overrides = [read_config_file(path) for path in config_files]
+    if preset is None:
+        preset = next((values["preset"] for values in reversed(file_overrides) if "preset" in values), default_preset)
+    if preset not in PRESETS:
+        raise ValueError(f"unknown preset: {preset} (known: {', '.join(PRESETS)})")
+    config = apply_overrides(ExperimentConfig(), PRESETS[preset]())
+    for values in file_overrides:
+        apply_overrides(config, {key: value for key, value in values.items() if key != "preset"})
+    for text in overrides:
+        apply_overrides(config, parse_override(text))
+    _expand_name(config, config.name)
+    return config
+
+
+def to_dict(config) -> dict:
+    return dataclasses.asdict(config)
+
+
+def add_arguments(parser: argparse.ArgumentParser, default_preset: str = DEFAULT_PRESET):
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=None, help=f"base setup (default: {default_preset})")
+    parser.add_argument("--config", action="append", default=[], help="YAML / JSON file of overrides, may be given several times")
+    parser.add_argument("--set", action="append", default=[], dest="overrides", metavar="KEY=VALUE", help="single override, e.g. simulation.camera.height=180")
+    parser.add_argument("--print-config", action="store_true", help="print the resolved config and exit")
+
+
+def config_from_args(args: argparse.Namespace, default_preset: str = DEFAULT_PRESET) -> ExperimentConfig:
+    config = load_config(preset=args.preset, config_files=args.config, overrides=args.overrides, default_preset=default_preset)
+    if args.print_config:
+        print(json.dumps(to_dict(config), indent=2))
+        raise SystemExit(0)
+    return config
+
+
+def from_cli(argv: list = None, description: str = None, default_preset: str = DEFAULT_PRESET) -> ExperimentConfig:
+    """
+    parses --preset / --config / --set (and --print-config) from the command line
+    default_preset: used when neither --preset nor a config file names one
+    """
+    parser = argparse.ArgumentParser(description=description)
+    add_arguments(parser, default_preset)
+    args = parser.parse_args(argv)
+    try:
+        return config_from_args(args, default_preset)
+    except (ValueError, OSError) as error:
+        parser.error(str(error))
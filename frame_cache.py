@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import cv2
+import numpy as np
+
+
+# decodes the videos of a LeRobot dataset once into a memory-mapped uint8 array, so training reads frames from the page cache
+# python frame_cache.py --dataset <lerobot dataset> --output <cache dir> [--size 224] [--workers 8]
+# <cache dir>/frames.npy    (total frames, height, width, 3) rgb, opened with mmap_mode="r"
+# <cache dir>/index.json    episode index -> [first row, length], shape and the fingerprint of the source videos
+# video frame i of an episode is assumed to be step i (LeRobot timestamps are frame_index / fps)
+
+DEFAULT_VIDEO_KEY = "observation.images.ego_view"
+FRAMES_FILE = "frames.npy"
+INDEX_FILE = "index.json"
+
+
+def read_jsonl(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def episode_video_paths(dataset_path: str, video_key: str = DEFAULT_VIDEO_KEY) -> dict:
+    """
+    episode index -> (video path, length) from meta/info.json and meta/episodes.jsonl
+    """
+    with open(os.path.join(dataset_path, "meta", "info.json")) as f:
+        info = json.load(f)
+    chunks_size = info.get("chunks_size", 1000)
+    episodes = {}
+    for episode in read_jsonl(os.path.join(dataset_path, "meta", "episodes.jsonl")):
+        episode_index = episode["episode_index"]
+        video_path = info["video_path"].format(episode_chunk=episode_index // chunks_size, video_key=video_key, episode_index=episode_index)
+        episodes[episode_index] = (os.path.join(dataset_path, video_path), episode["length"])
+    return episodes
+
+
+def video_fingerprint(dataset_path: str, video_paths: list) -> str:
+    """
+    hash of (path relative to the dataset, size, mtime) of every video, changes when a file is replaced or re-encoded
+    but not with the way the dataset path is spelled (relative / absolute, str / Path)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(os.path.relpath(path, dataset_path) for path in video_paths):
+        stat = os.stat(os.path.join(dataset_path, path))
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def decode_video(path: str, backend: str = "opencv"):
+    """
+    yields (height, width, 3) rgb frames in order
+    backend: "opencv", "pyav" or "decord"
+    """
+    if backend == "opencv":
+        capture = cv2.VideoCapture(path)
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        finally:
+            capture.release()
+    elif backend == "pyav":
+        import av
+        with av.open(path) as container:
+            for frame in container.decode(video=0):
+                yield frame.to_ndarray(format="rgb24")
+    elif backend == "decord":
+        import decord
+        reader = decord.VideoReader(path)
+        for frame_idx in range(len(reader)):
+            yield reader[frame_idx].asnumpy()
+    else:
+        raise ValueError(f"unknown decode backend: {backend}")
+
+
+def _decode_episode(job: tuple) -> tuple:
+    """
+    decodes one episode into its rows of the (already allocated) frames file, runs in a worker process
+    """
+    frames_path, video_path, offset, length, size, backend = job
+    frames = np.load(frames_path, mmap_mode="r+")
+    decoded = 0
+    for frame in decode_video(video_path, backend=backend):
+        if decoded == length:
+            break
+        if size is not None and frame.shape[:2] != size:
+            frame = cv2.resize(frame, (size[1], size[0]), interpolation=cv2.INTER_AREA)
+        frames[offset + decoded] = frame
+        decoded += 1
+    if decoded == 0:
+        raise RuntimeError(f"no frame decoded from {video_path}")
+    # a video shorter than its episode repeats its last frame, like the dataset clamps step indices
+    frames[offset + decoded:offset + length] = frames[offset + decoded - 1]
+    frames.flush()
+    return video_path, decoded, length
+
+
+def build_frame_cache(dataset_path: str, output_dir: str, video_key: str = DEFAULT_VIDEO_KEY, size: tuple = None, backend: str = "opencv", workers: int = 4) -> dict:
+    """
+    size: optional (height, width) to downscale to, the native resolution otherwise
+    returns the index
+    """
+    start = time.perf_counter()
+    episodes = episode_video_paths(dataset_path, video_key)
+    first_path = episodes[min(episodes)][0]
+    first_frame = next(decode_video(first_path, backend=backend))
+    frame_shape = tuple(size) + (3, ) if size is not None else first_frame.shape
+    total_frames = sum(length for _, length in episodes.values())
+
+    os.makedirs(output_dir, exist_ok=True)
+    frames_path = os.path.join(output_dir, FRAMES_FILE)
+    np.lib.format.open_memmap(frames_path, mode="w+", dtype=np.uint8, shape=(total_frames, ) + frame_shape).flush()
+    jobs = []
+    episode_rows = {}
+    offset = 0
+    for episode_index in sorted(episodes):
+        video_path, length = episodes[episode_index]
+        jobs.append((frames_path, video_path, offset, length, frame_shape[:2] if size is not None else None, backend))
+        episode_rows[str(episode_index)] = [offset, length]
+        offset += length
+    with multiprocessing.get_context("spawn").Pool(processes=workers) as pool:
+        for video_path, decoded, length in pool.imap_unordered(_decode_episode, jobs):
+            if decoded != length:
+                print(f"warning: {video_path} has {decoded} frames, episode has {length} steps")
+
+    index = {
+        "dataset_path": os.path.abspath(dataset_path),
+        "video_key": video_key,
+        "shape": [total_frames, *frame_shape],
+        "episodes": episode_rows,
+        "fingerprint": video_fingerprint(dataset_path, [video_path for video_path, _ in episodes.values()]),
+        "backend": backend,
+    }
+    with open(os.path.join(output_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+    elapsed = time.perf_counter() - start
+    print(f"{len(episodes)} episodes, {total_frames} frames {frame_shape} decoded in {elapsed:.1f}s ({total_frames / elapsed:.0f} frames/s), "
+          f"{total_frames * int(np.prod(frame_shape)) / 1e9:.2f} GB in {frames_path}")
+    return index
+
+
+class FrameCache:
+    """
+    read side of a frame cache, the memory map is opened lazily in every process (pickling sends only the paths,
+    so dataloader workers never copy the array)
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.episodes = {int(episode_index): rows for episode_index, rows in self.index["episodes"].items()}
+        self._frames = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_frames"] = None
+        return state
+
+    @property
+    def frames(self) -> np.ndarray:
+        if self._frames is None:
+            self._frames = np.load(os.path.join(self.cache_dir, FRAMES_FILE), mmap_mode="r")
+        return self._frames
+
+    def is_stale(self, dataset_path: str) -> bool:
+        """
+        True when the dataset's videos changed since the cache was built
+        """
+        video_paths = [video_path for video_path, _ in episode_video_paths(dataset_path, self.index["video_key"]).values()]
+        return video_fingerprint(dataset_path, video_paths) != self.index["fingerprint"]
+
+    def get_frames(self, episode_index: int, step_indices: np.ndarray) -> np.ndarray:
+        """
+        (len(step_indices), height, width, 3), a read-only view into the memory map when the steps are consecutive
+        """
+        offset, length = self.episodes[episode_index]
+        step_indices = np.clip(step_indices, 0, length - 1)
+        first = int(step_indices[0])
+        if len(step_indices) == 1 or np.all(np.diff(step_indices) == 1):
+            return self.frames[offset + first:offset + first + len(step_indices)]
+        return self.frames[offset + step_indices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="decode a LeRobot dataset's videos into a memory-mapped frame cache")
+    parser.add_argument("--dataset", required=True, help="LeRobot dataset directory")
+    parser.add_argument("--output", required=True, help="cache directory")
+    parser.add_argument("--video-key", default=DEFAULT_VIDEO_KEY)
+    parser.add_argument("--size", type=int, nargs="+", default=None, help="downscale to SIZE (square) or HEIGHT WIDTH")
+    parser.add_argument("--backend", default="opencv", choices=["opencv", "pyav", "decord"])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    size = None if args.size is None else (args.size[0], args.size[-1])
+    build_frame_cache(args.dataset, args.output, video_key=args.video_key, size=size, backend=args.backend, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
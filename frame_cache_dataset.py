@@ -0,0 +1,30 @@
+# this uses the gr00t conda environment
+
+import numpy as np
+from gr00t.data.dataset import LeRobotSingleDataset
+
+from frame_cache import FrameCache
+
+
+class FrameCachedLeRobotDataset(LeRobotSingleDataset):
+    """
+    LeRobotSingleDataset that reads video frames from frame caches (frame_cache.py) instead of decoding the videos
+    frame_cache_dirs: video modality key (e.g. "video.ego_view") -> cache directory; keys without a cache are still decoded
+    everything else (parquet data, transforms, statistics) is the regular dataset
+    """
+    def __init__(self, *args, frame_cache_dirs: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frame_caches = {key: FrameCache(cache_dir) for key, cache_dir in frame_cache_dirs.items()}
+        for key, frame_cache in self.frame_caches.items():
+            if frame_cache.is_stale(str(self.dataset_path)):
+                raise ValueError(f"frame cache {frame_cache.cache_dir} of {key} is stale, rebuild it with frame_cache.py")
+
+    def get_video(self, trajectory_id: int, key: str, base_index: int) -> np.ndarray:
+        frame_cache = self.frame_caches.get(key)
+        if frame_cache is None:
+            return super().get_video(trajectory_id, key, base_index)
+        step_indices = self.delta_indices[key] + base_index
+        # clamp like the decoding path: the trajectory is padded with its first and last frame
+        trajectory_length = self.trajectory_lengths[self.get_trajectory_index(trajectory_id)]
+        step_indices = np.minimum(np.maximum(step_indices, 0), trajectory_length - 1)
+        return frame_cache.get_frames(trajectory_id, step_indices)
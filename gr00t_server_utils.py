@@ -0,0 +1,509 @@
+import asyncio
+import contextlib
+import json
+import struct
+import time
+import threading
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+
+import gr00t_transport
+import shm_transport
+from server_cache import ActionChunkCache, TaskTokenCache, install_task_token_cache
+from server_metrics import ServerMetrics, ProfiledPolicy
+
+
+# the inference server app, kept free of torch / gr00t imports so it can run with StubPolicy on a CPU-only box
+# run_inference_server.py builds it around the real Gr00tPolicy
+
+
+# Define a Pydantic model for the request body
+class InferenceRequest(BaseModel):
+    task: str
+    obs: list
+    state: dict
+
+
+OBS_SHAPE = (256, 256, 3)
+
+
+class InvalidRequest(ValueError):
+    """
+    a request that parses but cannot be fed to the policy (wrong obs shape, non-numeric state, ...), answered with 422
+    """
+
+
+def _checked_obs(obs, leading: tuple) -> np.ndarray:
+    try:
+        obs = np.asarray(obs)
+    except ValueError as error: # ragged nested lists
+        raise InvalidRequest(f"obs: {error}")
+    if obs.shape != leading + OBS_SHAPE:
+        raise InvalidRequest(f"obs: expected shape {leading + OBS_SHAPE}, got {obs.shape}")
+    if obs.dtype != np.uint8:
+        if not np.issubdtype(obs.dtype, np.integer) or obs.min() < 0 or obs.max() > 255:
+            raise InvalidRequest(f"obs: expected uint8 pixel values, got {obs.dtype}")
+        obs = obs.astype(np.uint8)
+    return obs
+
+
+def _checked_state(state, leading: tuple) -> dict:
+    if not isinstance(state, dict) or not state:
+        raise InvalidRequest("state: expected a mapping of joint part name -> joint positions")
+    checked = {}
+    for joint_part_name, joint_state in state.items():
+        try:
+            joint_state = np.asarray(joint_state, dtype=float)
+        except (ValueError, TypeError) as error:
+            raise InvalidRequest(f"state.{joint_part_name}: {error}")
+        if joint_state.ndim != len(leading) + 1 or joint_state.shape[:-1] != leading or joint_state.shape[-1] == 0:
+            raise InvalidRequest(f"state.{joint_part_name}: expected shape {leading + ('joint num', )}, got {joint_state.shape}")
+        checked[joint_part_name] = joint_state
+    return checked
+
+
+def validate_request(task, obs, state) -> tuple:
+    """
+    checks a decoded single request, returns (task, obs (256, 256, 3) uint8, state part -> (joint num, ) float)
+    """
+    if not isinstance(task, str):
+        raise InvalidRequest(f"task: expected a string, got {type(task).__name__}")
+    return task, _checked_obs(obs, ()), _checked_state(state, ())
+
+
+def validate_batch_request(tasks, obs, state) -> tuple:
+    """
+    checks a decoded batch request, every entry must have the same batch size N as tasks
+    """
+    if not isinstance(tasks, list) or not tasks or not all(isinstance(task, str) for task in tasks):
+        raise InvalidRequest("tasks: expected a non-empty list of strings")
+    leading = (len(tasks), )
+    return tasks, _checked_obs(obs, leading), _checked_state(state, leading)
+
+
+def bad_request(error: Exception) -> Response:
+    """
+    422 for a body that does not validate (like FastAPI's own request models), 400 for one that cannot be parsed
+    """
+    if isinstance(error, ValidationError):
+        return Response(content=json.dumps({"detail": json.loads(error.json())}), status_code=422, media_type=gr00t_transport.JSON_CONTENT_TYPE)
+    if isinstance(error, InvalidRequest):
+        return Response(content=json.dumps({"detail": str(error)}), status_code=422, media_type=gr00t_transport.JSON_CONTENT_TYPE)
+    return Response(content=json.dumps({"detail": f"malformed request body: {error!r}"}), status_code=400, media_type=gr00t_transport.JSON_CONTENT_TYPE)
+
+
+DECODE_ERRORS = (ValueError, TypeError, KeyError, struct.error) # ValidationError and JSONDecodeError are ValueErrors
+
+
+class BatchInferenceRequest(BaseModel):
+    tasks: list
+    obs: list
+    state: dict
+
+
+def make_step_data(task: str, obs, state: dict) -> dict:
+    step_data = {}
+    step_data["video.ego_view"] = np.asarray(obs, dtype=np.uint8).reshape((1,256, 256, 3))
+    for joint_part_name, joint_state in state.items():
+        step_data[f"state.{joint_part_name}"] = np.asarray(joint_state, dtype=float).reshape((1, len(joint_state)))
+    step_data["annotation.human.action.task_description"] = [task]
+    return step_data
+
+
+def make_batch_step_data(tasks: list, obs, state: dict) -> dict:
+    """
+    batched input for policy.get_action, every entry gets a leading batch dim of N and a time dim of 1
+    """
+    batch_size = len(tasks)
+    step_data = {}
+    step_data["video.ego_view"] = np.asarray(obs, dtype=np.uint8).reshape((batch_size, 1, 256, 256, 3))
+    for joint_part_name, joint_state in state.items():
+        joint_state = np.asarray(joint_state, dtype=float)
+        step_data[f"state.{joint_part_name}"] = joint_state.reshape((batch_size, 1, joint_state.shape[-1]))
+    step_data["annotation.human.action.task_description"] = list(tasks)
+    return step_data
+
+
+class StubTokenizer:
+    """
+    stands in for the policy's text tokenizer: hashes words to ids after sleeping latency seconds
+    """
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+
+    def __call__(self, text, **kwargs) -> dict:
+        time.sleep(self.latency)
+        texts = [text] if isinstance(text, str) else list(text)
+        return {"input_ids": [[hash(word) % 32000 for word in item.split()] for item in texts]}
+
+
+class StubPolicy:
+    """
+    stands in for Gr00tPolicy: returns random action chunks after sleeping like a forward pass would
+    latency = fixed_latency + per_sample_latency * batch size (seconds)
+    forward passes are serialized like they would be on a single GPU
+    the task text goes through a StubTokenizer, so the task token cache can be exercised
+    """
+    def __init__(self, action_horizon: int = 16, fixed_latency: float = 0.03, per_sample_latency: float = 0.002, seed: int = 0, tokenizer_latency: float = 0.002):
+        self.action_horizon = action_horizon
+        self.fixed_latency = fixed_latency
+        self.per_sample_latency = per_sample_latency
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.tokenizer = StubTokenizer(latency=tokenizer_latency)
+
+    def get_action(self, step_data: dict) -> dict:
+        video = step_data["video.ego_view"]
+        batched = video.ndim == 5
+        batch_size = video.shape[0] if batched else 1
+        self.tokenizer(step_data["annotation.human.action.task_description"])
+        with self.lock:
+            time.sleep(self.fixed_latency + self.per_sample_latency * batch_size)
+        actions = {}
+        for name, state in step_data.items():
+            if not name.startswith("state."):
+                continue
+            shape = (batch_size, self.action_horizon, state.shape[-1]) if batched else (self.action_horizon, state.shape[-1])
+            actions["action." + name[len("state."):]] = self.rng.normal(scale=0.01, size=shape).astype(np.float32)
+        return actions
+
+
+class DynamicBatcher:
+    """
+    coalesces concurrent single requests into one batched policy.get_action call
+    a batch is flushed when it has max_batch_size requests or the oldest request waited max_wait_ms, whichever comes first
+    requests are validated in submit, so a malformed one fails only its own caller; if a batch still fails
+    (e.g. requests with different joint layouts), its requests are retried one at a time
+    """
+    def __init__(self, policy, max_batch_size: int = 8, max_wait_ms: float = 5.0, metrics: ServerMetrics = None):
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics if metrics is not None else ServerMetrics()
+        self.queue = None
+        self.worker = None
+
+    async def submit(self, task: str, obs, state: dict) -> dict:
+        task, obs, state = validate_request(task, obs, state)
+        if self.worker is None:
+            # created lazily so they bind to the server's running event loop
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((task, obs, state, future))
+        return await future
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _infer(self, batch: list) -> list:
+        with self.metrics.time("convert"):
+            tasks = [task for task, _, _, _ in batch]
+            obs = np.stack([obs for _, obs, _, _ in batch])
+            state = {
+                joint_part_name: np.stack([np.asarray(state[joint_part_name], dtype=float) for _, _, state, _ in batch])
+                for joint_part_name in batch[0][2]
+            }
+            step_data = make_batch_step_data(tasks, obs, state)
+        predicted_action = self.policy.get_action(step_data)
+        return [{name: value[batch_idx] for name, value in predicted_action.items()} for batch_idx in range(len(batch))]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self.metrics.observe_batch_size(len(batch))
+            try:
+                results = await run_in_threadpool(self._infer, batch)
+            except Exception as error:
+                if len(batch) == 1:
+                    self._resolve(batch[0][3], error=error)
+                    continue
+                for item in batch:
+                    try:
+                        result, = await run_in_threadpool(self._infer, [item])
+                    except Exception as error:
+                        self._resolve(item[3], error=error)
+                    else:
+                        self._resolve(item[3], result=result)
+                continue
+            for (_, _, _, future), result in zip(batch, results):
+                self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future, result: dict = None, error: Exception = None):
+        if future.done(): # the caller went away
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def create_app(policy, max_batch_size: int = 1, max_wait_ms: float = 5.0, verbose: bool = False, profile_dir: str = "./results/server_profile", action_cache_size: int = 0, action_cache_ttl: float = 600.0, task_cache_size: int = 0, shm_socket_path: str = None) -> FastAPI:
+    """
+    policy: anything with get_action(step_data) -> dict, e.g. Gr00tPolicy or StubPolicy
+    max_batch_size > 1 turns on dynamic batching of concurrent /inference requests
+    verbose: print every received task
+    profile_dir: where POST /profile writes its traces
+    action_cache_size > 0 turns on the ActionChunkCache for /inference (only for a deterministic policy)
+    task_cache_size > 0 caches the tokenization of task texts in the policy's tokenizers (TaskTokenCache)
+    shm_socket_path: also serve same-host Gr00tShmClient requests on this unix socket (shm_transport), alongside HTTP
+    """
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        shm_server = None
+        if shm_socket_path is not None:
+            loop = asyncio.get_running_loop()
+
+            def infer_shm(task: str, obs, state: dict) -> dict:
+                # obs and state are views into the client's shared memory, the same path as /inference from here on
+                metrics.count("requests.shm")
+                try:
+                    task, obs, state = validate_request(task, obs, state)
+                    return asyncio.run_coroutine_threadsafe(predict(task, obs, state), loop).result()
+                except Exception:
+                    metrics.count("errors.shm")
+                    raise
+
+            shm_server = shm_transport.ShmInferenceServer(infer_shm, socket_path=shm_socket_path).start()
+            print(f"Shared memory transport listening on: {shm_socket_path}")
+        yield
+        if shm_server is not None:
+            shm_server.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    metrics = ServerMetrics()
+    profiled_policy = ProfiledPolicy(policy, metrics, profile_dir=profile_dir)
+    batcher = DynamicBatcher(profiled_policy, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, metrics=metrics) if max_batch_size > 1 else None
+    action_cache = ActionChunkCache(max_entries=action_cache_size, ttl=action_cache_ttl) if action_cache_size > 0 else None
+    app.state.metrics = metrics
+    app.state.profiled_policy = profiled_policy
+    app.state.batcher = batcher
+    app.state.action_cache = action_cache
+    task_cache = None
+    if task_cache_size > 0:
+        task_cache = TaskTokenCache(max_entries=task_cache_size)
+        if install_task_token_cache(policy, task_cache) == 0:
+            print("Task token cache not installed: the policy exposes no tokenizer")
+            task_cache = None
+    app.state.task_cache = task_cache
+
+    def infer(task: str, obs, state: dict) -> dict:
+        with metrics.time("convert"):
+            step_data = make_step_data(task, obs, state)
+        return profiled_policy.get_action(step_data)
+
+    def infer_batch(tasks: list, obs, state: dict) -> dict:
+        # a single forward pass for all N environments
+        with metrics.time("convert"):
+            step_data = make_batch_step_data(tasks, obs, state)
+        metrics.observe_batch_size(len(tasks))
+        return profiled_policy.get_action(step_data)
+
+    async def predict(task: str, obs, state: dict) -> dict:
+        """
+        action cache, then dynamic batcher or a threadpool forward pass (off the event loop)
+        """
+        cache_key = None
+        if action_cache is not None:
+            with metrics.time("cache_lookup"):
+                cache_key = ActionChunkCache.make_key(task, obs, state)
+                cached_action = action_cache.get(cache_key)
+            if cached_action is not None:
+                return cached_action
+
+        if batcher is not None:
+            predicted_action = await batcher.submit(task, obs, state)
+        else:
+            predicted_action = await run_in_threadpool(infer, task, obs, state)
+        if cache_key is not None:
+            action_cache.put(cache_key, predicted_action)
+        return predicted_action
+
+    def encode_response(request: Request, predicted_action: dict, batch_size: int = None) -> Response:
+        """
+        serialized here instead of by FastAPI, so it can be timed
+        batch_size: set for batched actions, the JSON response is then a list of per-environment dicts
+        """
+        with metrics.time("serialize"):
+            if gr00t_transport.BINARY_CONTENT_TYPE in request.headers.get("accept", ""):
+                return Response(content=gr00t_transport.encode_actions(predicted_action), media_type=gr00t_transport.BINARY_CONTENT_TYPE)
+            if batch_size is None:
+                return_data = {name: value.tolist() for name, value in predicted_action.items()}
+            else:
+                return_data = [
+                    {name: value[batch_idx].tolist() for name, value in predicted_action.items()}
+                    for batch_idx in range(batch_size)
+                ]
+            return Response(content=json.dumps(return_data), media_type=gr00t_transport.JSON_CONTENT_TYPE)
+
+    @app.post("/inference")
+    async def run_inference(request: Request):
+        """
+        Accepts a JSON payload (or the gr00t_transport binary format) and processes it for inference.
+        The response uses the binary format if the client accepts it, JSON otherwise.
+        """
+        metrics.count("requests./inference")
+        try:
+            body = await request.body()
+            try:
+                with metrics.time("decode"):
+                    if request.headers.get("content-type", "").startswith(gr00t_transport.BINARY_CONTENT_TYPE):
+                        task, obs, state = gr00t_transport.decode_inference_request(body)
+                    else:
+                        inference_request = InferenceRequest(**json.loads(body))
+                        task, obs, state = inference_request.task, inference_request.obs, inference_request.state
+                    task, obs, state = validate_request(task, obs, state)
+            except DECODE_ERRORS as error:
+                metrics.count("errors./inference")
+                return bad_request(error)
+
+            if verbose:
+                print(f"Received Task: {task}")
+
+            predicted_action = await predict(task, obs, state)
+
+            return encode_response(request, predicted_action)
+        except Exception:
+            metrics.count("errors./inference")
+            raise
+
+    @app.post("/inference_batch")
+    async def run_inference_batch(request: Request):
+        """
+        Same as /inference for N environments at once: tasks (N,), obs (N, 256, 256, 3), state part -> (N, joint num).
+        Returns N action chunks, as a list of dicts in JSON or as arrays with a leading batch dim in the binary format.
+        """
+        metrics.count("requests./inference_batch")
+        try:
+            body = await request.body()
+            try:
+                with metrics.time("decode"):
+                    if request.headers.get("content-type", "").startswith(gr00t_transport.BINARY_CONTENT_TYPE):
+                        tasks, obs, state = gr00t_transport.decode_batch_inference_request(body)
+                    else:
+                        inference_request = BatchInferenceRequest(**json.loads(body))
+                        tasks, obs, state = inference_request.tasks, inference_request.obs, inference_request.state
+                    tasks, obs, state = validate_batch_request(tasks, obs, state)
+            except DECODE_ERRORS as error:
+                metrics.count("errors./inference_batch")
+                return bad_request(error)
+
+            if verbose:
+                print(f"Received batch of {len(tasks)}")
+
+            predicted_action = await run_in_threadpool(infer_batch, tasks, obs, state)
+
+            return encode_response(request, predicted_action, batch_size=len(tasks))
+        except Exception:
+            metrics.count("errors./inference_batch")
+            raise
+
+    @app.websocket("/ws")
+    async def stream_inference(websocket: WebSocket):
+        """
+        persistent streaming channel: every binary message is a gr00t_transport stream request tagged with an id,
+        requests are handled concurrently (so a client can pipeline several) and answered with the same id, possibly out of order
+        """
+        await websocket.accept()
+        send_lock = asyncio.Lock()
+        in_flight = set()
+
+        async def handle(data: bytes):
+            metrics.count("requests./ws")
+            try:
+                with metrics.time("decode"):
+                    request_id, task, obs, state = gr00t_transport.decode_stream_request(data)
+            except Exception as error:
+                # without its id the error cannot be routed to the waiting request, the client sees the connection close instead
+                metrics.count("errors./ws")
+                async with send_lock:
+                    await websocket.close(code=1007, reason=f"undecodable request: {error!r}"[:100])
+                return
+            try:
+                task, obs, state = validate_request(task, obs, state)
+                if verbose:
+                    print(f"Received Task: {task}")
+                predicted_action = await predict(task, obs, state)
+                with metrics.time("serialize"):
+                    response = gr00t_transport.encode_stream_response(request_id, predicted_action)
+            except Exception as error:
+                metrics.count("errors./ws")
+                response = gr00t_transport.encode_stream_response(request_id, {}, error=repr(error))
+            async with send_lock:
+                try:
+                    await websocket.send_bytes(response)
+                except (WebSocketDisconnect, RuntimeError): # closed meanwhile
+                    pass
+
+        try:
+            while True:
+                data = await websocket.receive_bytes()
+                handler = asyncio.get_running_loop().create_task(handle(data))
+                in_flight.add(handler)
+                handler.add_done_callback(in_flight.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for handler in list(in_flight):
+                handler.cancel()
+
+    @app.get("/metrics")
+    def get_metrics():
+        """
+        counters, per-stage latency histograms (ms), batch sizes, batching queue depth, profiler state and cache statistics
+        """
+        snapshot = metrics.snapshot()
+        snapshot["queue_depth"] = batcher.queue_depth() if batcher is not None else 0
+        snapshot["profiler"] = profiled_policy.status()
+        if action_cache is not None:
+            snapshot["action_cache"] = action_cache.stats()
+        if task_cache is not None:
+            snapshot["task_cache"] = task_cache.stats()
+        return snapshot
+
+    @app.post("/profile")
+    def start_profile(kind: str = "cprofile", requests: int = 10):
+        """
+        profiles the next `requests` policy calls with cProfile (kind=cprofile) or torch.profiler (kind=torch)
+        """
+        try:
+            return profiled_policy.arm(kind, requests)
+        except ValueError as error:
+            return Response(content=json.dumps({"detail": str(error)}), status_code=400, media_type=gr00t_transport.JSON_CONTENT_TYPE)
+
+    return app
+
+
+def serve_in_thread(app: FastAPI, host: str = "localhost", port: int = 9876) -> uvicorn.Server:
+    """
+    starts uvicorn on a background thread (for benchmarks), stop it with server.should_exit = True
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    server.thread = thread
+    return server
+
+
+def stop_server(server: uvicorn.Server):
+    server.should_exit = True
+    server.thread.join()
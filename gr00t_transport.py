@@ -0,0 +1,140 @@
+import json
+import struct
+import numpy as np
+
+
+# binary wire format shared by the simulator client and the inference server
+# layout: MAGIC | uint32 header length | json header | padding | array bytes (each 8-byte aligned)
+MAGIC = b"GR00"
+ALIGNMENT = 8
+JSON_CONTENT_TYPE = "application/json"
+BINARY_CONTENT_TYPE = "application/x-gr00t-binary"
+_PREFIX = struct.Struct("<4sI")
+
+
+def _pad(size: int) -> int:
+    return (-size) % ALIGNMENT
+
+
+def encode_message(meta: dict, arrays: dict) -> bytes:
+    """
+    pack json-able meta data and a dict of numpy arrays into a single bytes message
+    the array data is not converted to python objects, only copied once into the output
+    """
+    array_specs = []
+    buffers = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        array_specs.append([name, array.dtype.str, list(array.shape), offset])
+        buffers.append(memoryview(array).cast("B"))
+        padding = _pad(array.nbytes)
+        if padding:
+            buffers.append(b"\x00" * padding)
+        offset += array.nbytes + padding
+
+    header = json.dumps({"meta": meta, "arrays": array_specs}).encode("utf-8")
+    header += b" " * _pad(_PREFIX.size + len(header)) # keep the array data aligned
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, *buffers])
+
+
+def decode_message(data: bytes) -> tuple:
+    """
+    inverse of encode_message, returns (meta, arrays)
+    arrays are zero-copy read-only views into data
+    """
+    magic, header_len = _PREFIX.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a gr00t binary message")
+    header = json.loads(bytes(data[_PREFIX.size:_PREFIX.size + header_len]))
+    data_start = _PREFIX.size + header_len
+    arrays = {}
+    for name, dtype, shape, offset in header["arrays"]:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=data_start + offset).reshape(shape)
+    return header["meta"], arrays
+
+
+def encode_inference_request(task: str, obs: np.ndarray, state: dict) -> bytes:
+    """
+    obs: (256, 256, 3) uint8
+    state: joint part name -> joint positions
+    """
+    arrays = {"obs": np.asarray(obs, dtype=np.uint8)}
+    for joint_part_name, joint_state in state.items():
+        arrays[f"state.{joint_part_name}"] = np.asarray(joint_state, dtype=float)
+    return encode_message({"task": task}, arrays)
+
+
+def decode_inference_request(data: bytes) -> tuple:
+    """
+    returns (task, obs, state) in the same form encode_inference_request takes
+    """
+    meta, arrays = decode_message(data)
+    obs = arrays.pop("obs")
+    state = {name[len("state."):]: value for name, value in arrays.items()}
+    return meta["task"], obs, state
+
+
+def encode_batch_inference_request(tasks: list, obs: np.ndarray, state: dict) -> bytes:
+    """
+    tasks: N task strings
+    obs: (N, 256, 256, 3) uint8
+    state: joint part name -> (N, joint num)
+    """
+    arrays = {"obs": np.asarray(obs, dtype=np.uint8)}
+    for joint_part_name, joint_state in state.items():
+        arrays[f"state.{joint_part_name}"] = np.asarray(joint_state, dtype=float)
+    return encode_message({"tasks": list(tasks)}, arrays)
+
+
+def decode_batch_inference_request(data: bytes) -> tuple:
+    """
+    returns (tasks, obs, state) in the same form encode_batch_inference_request takes
+    """
+    meta, arrays = decode_message(data)
+    obs = arrays.pop("obs")
+    state = {name[len("state."):]: value for name, value in arrays.items()}
+    return meta["tasks"], obs, state
+
+
+def encode_stream_request(request_id: int, task: str, obs: np.ndarray, state: dict) -> bytes:
+    """
+    one frame of the websocket stream, the id lets several requests be in flight at once
+    """
+    arrays = {"obs": np.asarray(obs, dtype=np.uint8)}
+    for joint_part_name, joint_state in state.items():
+        arrays[f"state.{joint_part_name}"] = np.asarray(joint_state, dtype=float)
+    return encode_message({"id": request_id, "task": task}, arrays)
+
+
+def decode_stream_request(data: bytes) -> tuple:
+    """
+    returns (request_id, task, obs, state)
+    """
+    meta, arrays = decode_message(data)
+    obs = arrays.pop("obs")
+    state = {name[len("state."):]: value for name, value in arrays.items()}
+    return meta["id"], meta["task"], obs, state
+
+
+def encode_stream_response(request_id: int, actions: dict, error: str = None) -> bytes:
+    return encode_message({"id": request_id, "error": error}, actions)
+
+
+def decode_stream_response(data: bytes) -> tuple:
+    """
+    returns (request_id, actions, error)
+    """
+    meta, arrays = decode_message(data)
+    return meta["id"], arrays, meta["error"]
+
+
+def encode_actions(actions: dict) -> bytes:
+    return encode_message({}, actions)
+
+
+def decode_actions(data: bytes) -> dict:
+    _, arrays = decode_message(data)
+    return arrays
@@ -172,15 +172,78 @@ gr1_default_pose = {
 
 def make_joint_position(joint_name_to_angle: dict) -> np.ndarray:
     joint_positions = np.zeros(shape = (54, ), dtype=float)
-    for joint_name, angle in joint_name_to_angle.items():
-        joint_index = gr1_joints_index[joint_name]
-        joint_positions[joint_index] = angle
+    joint_indexes = [gr1_joints_index[joint_name] for joint_name in joint_name_to_angle]
+    joint_positions[joint_indexes] = list(joint_name_to_angle.values())
         
     return joint_positions
     
 default_joint_position = make_joint_position(joint_name_to_angle=gr1_default_pose)
 
 
+class Gr00tJointMap:
+    """
+    precompiled mapping between the 54 gr1 joints and the gr00t joint parts
+    index is the concatenation of all part indexes: joint_positions[index] gathers the whole gr00t state in one go,
+    and trajectory[:, index] = actions scatters a whole action chunk back
+    """
+    __slots__ = ("joint_part_names", "part_slices", "index", "joint_num", "joints_index", "_scatter_indexes")
+    
+    def __init__(self, joint_space: dict, joints_index: dict, joint_num: int = 54):
+        self.joint_part_names = tuple(joint_space)
+        self.joint_num = joint_num
+        self.joints_index = dict(joints_index)
+        self.part_slices = {}
+        start = 0
+        for joint_part_name, joint_names in joint_space.items():
+            self.part_slices[joint_part_name] = slice(start, start + len(joint_names))
+            start += len(joint_names)
+        self.index = np.array([joints_index[joint_name] for joint_names in joint_space.values() for joint_name in joint_names], dtype=np.intp)
+        self._scatter_indexes = {self.joint_part_names: self.index}
+    
+    def scatter_index(self, joint_part_names: tuple) -> np.ndarray:
+        """
+        concatenated index for a subset / reordering of the joint parts (e.g. arms_only actions have no waist), cached
+        """
+        if joint_part_names not in self._scatter_indexes:
+            self._scatter_indexes[joint_part_names] = np.concatenate([self.index[self.part_slices[joint_part_name]] for joint_part_name in joint_part_names])
+        return self._scatter_indexes[joint_part_names]
+    
+    def pack_state(self, joint_positions: np.ndarray) -> dict:
+        """
+        joint_positions: (54, ) -> joint part name -> joint positions, the parts are views of a single gathered array
+        """
+        state = joint_positions[self.index]
+        return {joint_part_name: state[part_slice] for joint_part_name, part_slice in self.part_slices.items()}
+    
+    def unpack_actions(self, output: dict, out: np.ndarray = None) -> np.ndarray:
+        """
+        output: "action.<joint part>" -> (horizon, joint num)
+        out: optional (horizon, 54) buffer, only the gr00t joint columns are written
+        """
+        joint_part_names = tuple(joint_part_name[7:] for joint_part_name in output) # remove the action part
+        actions = np.concatenate([np.asarray(actions, dtype=float) for actions in output.values()], axis=1)
+        if out is None:
+            out = np.zeros(shape=(actions.shape[0], self.joint_num), dtype=float)
+        out[:, self.scatter_index(joint_part_names)] = actions
+        return out
+    
+    def validate(self, dof_names: list):
+        """
+        checks the map against the articulation's dof_names (e.g. gr1.dof_names), raises ValueError on any mismatch
+        """
+        if len(dof_names) != self.joint_num:
+            raise ValueError(f"expected {self.joint_num} dofs, articulation has {len(dof_names)}")
+        mismatches = []
+        for joint_name, joint_index in self.joints_index.items():
+            if dof_names[joint_index] != joint_name:
+                mismatches.append(f"{joint_name}: expected at {joint_index}, articulation has {dof_names[joint_index]}")
+        if mismatches:
+            raise ValueError("joint map does not match the articulation:\n" + "\n".join(mismatches))
+
+
+gr00t_joint_map = Gr00tJointMap(gr1_gr00t_joint_space, gr1_joints_index)
+
+
         
 
 
@@ -0,0 +1,190 @@
+import abc
+import numpy as np
+import gr1_config
+
+
+# the simulator behind a small interface, so the control / inference loop does not depend on isaacsim directly
+# isaacsim is only imported when an IsaacSimGr1Env is created (SimulationApp must exist before any other isaacsim import)
+
+
+class Gr1Env(abc.ABC):
+    """
+    interface of a gr1 simulator: 54 joint positions in, camera rgba frames out
+    """
+    camera_height = 200 # camera width is fixed to 256
+
+    @abc.abstractmethod
+    def reset(self, seed: int = None):
+        pass
+
+    @abc.abstractmethod
+    def step(self):
+        pass
+
+    @abc.abstractmethod
+    def get_joint_positions(self) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def get_camera_rgba(self) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def apply_joint_positions(self, joint_positions: np.ndarray):
+        pass
+
+    def close(self):
+        pass
+
+
+class IsaacSimGr1Env(Gr1Env):
+    """
+    gr1 in an Isaac Sim USD scene with the head camera used by run_simulation.py
+    only one can exist per process
+    reset(seed) perturbs the initial state from that seed: gaussian noise of std joint_noise (rad) on the joint
+    positions and a uniform xy offset of up to object_position_noise (m) on every prim in object_prims
+    without a seed, every episode starts from the defaults of the scene
+    """
+    def __init__(self, usd_path: str, headless: bool = True, camera_height: int = 200, camera_focal_length: float = 1.2, camera_forward_dist: float = 0.25, camera_angle: float = 70, warmup_steps: int = 100, joint_noise: float = 0.01, object_prims: list = (), object_position_noise: float = 0.02):
+        from isaacsim import SimulationApp
+        self.simulation_app = SimulationApp({
+            "headless": headless,
+            "create_new_stage": False,
+            "open_usd" : usd_path,
+            "sync_loads": True, # wait until asset loads
+        })
+
+        from isaacsim.core.api import World
+        from isaacsim.core.api.robots import Robot
+        from isaacsim.sensors.camera.camera import Camera
+        import isaacsim.core.utils.numpy.rotations as rot_utils
+        from isaacsim.core.utils.types import ArticulationAction
+        from isaacsim.core.prims import SingleXFormPrim
+        self._articulation_action = ArticulationAction
+
+        self.camera_height = camera_height
+        self.warmup_steps = warmup_steps
+        self.joint_noise = joint_noise
+        self.object_position_noise = object_position_noise
+
+        ## 1. setup scene
+        self.world = World()
+        self.gr1 = self.world.scene.add(Robot(
+            prim_path="/World/gr1",
+            name="gr1",
+        ))
+        self.gr1_articulation_controller = self.gr1.get_articulation_controller()
+
+        # adding camera
+        self.camera = Camera(
+            prim_path="/World/gr1/head_yaw_link/camera",
+            name="camera",
+            translation=np.array([camera_forward_dist, 0.0, 0.07]),
+            frequency=60,
+            resolution=(256, camera_height),
+            orientation=rot_utils.euler_angles_to_quats(np.array([0, camera_angle, 0]), degrees=True),
+        )
+        self.camera.set_focal_length(camera_focal_length) # smaller => wider range of view
+        self.camera.set_clipping_range(0.1, 2)
+
+        ## 2. setup_post_load
+        self.world.reset()
+        self.camera.initialize()
+        self.camera.add_motion_vectors_to_frame()
+        self.gr1_articulation_controller.set_gains(kps = np.array([3000.0]*54), kds = np.array([100.0]*54)) # p is the stiffness, d is the gain
+        gr1_config.gr00t_joint_map.validate(self.gr1.dof_names)
+        # poses of the scene file, the noise of every reset is applied to these
+        self.objects = []
+        for prim_path in object_prims:
+            prim = SingleXFormPrim(prim_path=prim_path)
+            self.objects.append((prim, *prim.get_world_pose()))
+
+    def reset(self, seed: int = None):
+        self.world.reset()
+        joint_positions = gr1_config.default_joint_position
+        rng = np.random.default_rng(seed) if seed is not None else None
+        if rng is not None:
+            joint_positions = joint_positions + rng.normal(scale=self.joint_noise, size=(54, ))
+        for prim, position, orientation in self.objects:
+            offset = np.zeros(shape=(3, ), dtype=float)
+            if rng is not None:
+                offset[:2] = rng.uniform(-self.object_position_noise, self.object_position_noise, size=(2, ))
+            prim.set_world_pose(position=position + offset, orientation=orientation)
+        # set gr1 default position
+        self.gr1.set_joint_positions(positions=joint_positions)
+        # first, just initialize the world and wait
+        for _ in range(self.warmup_steps):
+            self.world.step(render=True)
+
+    def step(self):
+        self.world.step(render=True)
+
+    def get_joint_positions(self) -> np.ndarray:
+        return self.gr1.get_joint_positions()
+
+    def get_camera_rgba(self) -> np.ndarray:
+        return self.camera.get_rgba()
+
+    def apply_joint_positions(self, joint_positions: np.ndarray):
+        self.gr1_articulation_controller.apply_action(self._articulation_action(joint_positions=joint_positions))
+
+    def close(self):
+        self.simulation_app.close()
+
+
+class FakeGr1Env(Gr1Env):
+    """
+    pure numpy stand-in for IsaacSimGr1Env, for profiling the control loop on machines without Isaac Sim / a GPU
+    the 54 joints follow a PD model (same gains as run_simulation.py, unit inertia) integrated with implicit euler,
+    and the camera renders a synthetic frame with one marker per hand that moves with the arm joints
+    """
+    def __init__(self, camera_height: int = 200, physics_dt: float = 1 / 60, kp: float = 3000.0, kd: float = 100.0, substeps: int = 4):
+        self.camera_height = camera_height
+        self.dt = physics_dt / substeps
+        self.kp = kp
+        self.kd = kd
+        self.substeps = substeps
+        self.joint_positions = gr1_config.default_joint_position.copy()
+        self.joint_velocities = np.zeros(shape=(54, ), dtype=float)
+        self.target_positions = gr1_config.default_joint_position.copy()
+        self.rng = np.random.default_rng()
+        # static background: a vertical gradient (wall) above a flat table
+        rows = np.linspace(60, 200, camera_height, dtype=np.float32)[:, None, None]
+        self.background = np.broadcast_to(rows, (camera_height, 256, 3)).astype(np.uint8)
+        self.background[camera_height // 2:] = (90, 70, 50)
+        self.frame = np.empty(shape=(camera_height, 256, 4), dtype=np.uint8)
+        self.frame[:, :, 3] = 255
+        self._left_arm_index = gr1_config.gr00t_joint_map.index[gr1_config.gr00t_joint_map.part_slices["left_arm"]]
+        self._right_arm_index = gr1_config.gr00t_joint_map.index[gr1_config.gr00t_joint_map.part_slices["right_arm"]]
+
+    def reset(self, seed: int = None):
+        self.rng = np.random.default_rng(seed)
+        self.joint_positions = gr1_config.default_joint_position + self.rng.normal(scale=0.01, size=(54, ))
+        self.joint_velocities[:] = 0.0
+        self.target_positions = gr1_config.default_joint_position.copy()
+
+    def step(self):
+        # implicit euler of q'' = kp * (target - q) - kd * q', stable for any gain / dt
+        denominator = 1 + self.dt * self.kd + self.dt * self.dt * self.kp
+        for _ in range(self.substeps):
+            self.joint_velocities = (self.joint_velocities + self.dt * self.kp * (self.target_positions - self.joint_positions)) / denominator
+            self.joint_positions = self.joint_positions + self.dt * self.joint_velocities
+        self._render()
+
+    def _render(self):
+        self.frame[:, :, :3] = self.background
+        size = 16
+        for joint_index, color in [(self._left_arm_index, (220, 40, 40)), (self._right_arm_index, (40, 40, 220))]:
+            arm = self.joint_positions[joint_index]
+            row = int(np.clip(self.camera_height / 2 + 40 * arm[:3].sum(), 0, self.camera_height - size))
+            col = int(np.clip(128 + 60 * arm[3:].sum(), 0, 256 - size))
+            self.frame[row:row + size, col:col + size, :3] = color
+
+    def get_joint_positions(self) -> np.ndarray:
+        return self.joint_positions.copy()
+
+    def get_camera_rgba(self) -> np.ndarray:
+        return self.frame
+
+    def apply_joint_positions(self, joint_positions: np.ndarray):
+        self.target_positions = np.array(joint_positions, dtype=float)
@@ -1,21 +1,30 @@
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import gr1_config
+import gr00t_transport
+import shm_transport
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
-def make_gr00t_input(task: str, obs: np.ndarray, joint_positions: np.ndarray) -> dict:
+def make_gr00t_input(task: str, obs: np.ndarray, joint_positions: np.ndarray, as_json: bool = True) -> dict:
     """
     make inference_ready version of input
-    obs: (256, height, 3)
+    obs: (height, 256, 3), or the already padded (256, 256, 3) frame from FramePreparer.square_rgb
     joint_positions: (54, )
+    as_json: if False, obs and state are kept as numpy arrays (for the binary wire format)
     """
     gr00t_input = {}
     gr00t_input["task"] = task
-    gr00t_input["obs"] = make_square_img(obs).tolist()
-    gr00t_input["state"] = {}
-    for joint_part, joint_indexes in gr1_config.gr00t_joints_index.items():
-        gr00t_input["state"][joint_part] = joint_positions[joint_indexes].tolist()
+    gr00t_input["obs"] = obs if obs.shape[:2] == (256, 256) else make_square_img(obs)
+    gr00t_input["state"] = gr1_config.gr00t_joint_map.pack_state(joint_positions)
     
+    if as_json:
+        gr00t_input["obs"] = gr00t_input["obs"].tolist()
+        gr00t_input["state"] = {joint_part: joint_state.tolist() for joint_part, joint_state in gr00t_input["state"].items()}
     return gr00t_input
     
     
@@ -26,12 +35,289 @@ def make_square_img(obs: np.ndarray) -> np.ndarray:
     output = np.zeros(shape=(256,256,3), dtype=np.uint8)
     output[padding_height:padding_height+obs_shape[0]] = obs
     return output
+
+
+class FramePreparer:
+    """
+    turns camera rgba frames into the padded square gr00t input and the bgr video frame without per-step allocations
+    the returned arrays are owned buffers that are overwritten by the next call of the same method
+    """
+    def __init__(self, height: int, width: int = 256, size: int = 256):
+        # padding offsets are fixed per camera resolution
+        self.padding_height = int((size - height) / 2)
+        self.height = height
+        self.square_buffer = np.zeros(shape=(size, size, 3), dtype=np.uint8)
+        self.square_view = self.square_buffer[self.padding_height:self.padding_height + height, :width]
+        self.bgr_buffer = np.empty(shape=(height, width, 3), dtype=np.uint8)
+    
+    def square_rgb(self, rgba: np.ndarray) -> np.ndarray:
+        # copy the rgb channels straight from the rgba camera buffer into the letterboxed frame
+        np.copyto(self.square_view, rgba[:, :, :3])
+        return self.square_buffer
+    
+    def bgr(self, rgba: np.ndarray) -> np.ndarray:
+        # same as cv2.cvtColor(rgba[:, :, :3], cv2.COLOR_RGB2BGR) into a reused buffer
+        np.copyto(self.bgr_buffer, rgba[:, :, 2::-1])
+        return self.bgr_buffer
+    
+    
+    
+class Gr00tInferenceClient:
+    """
+    keeps a pooled keep-alive session to the inference server, so consecutive chunks reuse one TCP connection
+    the latency of every call is stored in call_latencies (seconds)
+    """
+    def __init__(self, url = "http://localhost:9876/inference", wire_format: str = "json", timeout: float = 10.0, retries: int = 3, backoff_factor: float = 0.1, pool_maxsize: int = 4, batch_url = None):
+        self.url = url
+        self.batch_url = batch_url if batch_url is not None else url.rsplit("/", 1)[0] + "/inference_batch"
+        self.wire_format = wire_format
+        self.timeout = timeout
+        self.call_latencies = []
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None, # inference is idempotent, so POST may be retried too
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def infer(self, payload: dict) -> dict:
+        """
+        wire_format: "json" sends nested lists, "binary" sends raw array bytes (see gr00t_transport)
+        """
+        start = time.perf_counter()
+        if self.wire_format == "json":
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            output = response.json()
+        elif self.wire_format == "binary":
+            response = self.session.post(
+                self.url,
+                data=gr00t_transport.encode_inference_request(payload["task"], payload["obs"], payload["state"]),
+                headers={"Content-Type": gr00t_transport.BINARY_CONTENT_TYPE, "Accept": gr00t_transport.BINARY_CONTENT_TYPE},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            output = gr00t_transport.decode_actions(response.content)
+        else:
+            raise ValueError(f"unknown wire format: {self.wire_format}")
+        self.call_latencies.append(time.perf_counter() - start)
+        return output
+    
+    def infer_batch(self, payloads: list) -> list:
+        """
+        one /inference_batch call for several make_gr00t_input payloads, returns one output dict per payload
+        """
+        start = time.perf_counter()
+        tasks = [payload["task"] for payload in payloads]
+        state = {
+            joint_part: [payload["state"][joint_part] for payload in payloads]
+            for joint_part in payloads[0]["state"]
+        }
+        if self.wire_format == "json":
+            response = self.session.post(self.batch_url, json={"tasks": tasks, "obs": [payload["obs"] for payload in payloads], "state": state}, timeout=self.timeout)
+            response.raise_for_status()
+            outputs = response.json()
+        elif self.wire_format == "binary":
+            response = self.session.post(
+                self.batch_url,
+                data=gr00t_transport.encode_batch_inference_request(tasks, np.stack([payload["obs"] for payload in payloads]), {joint_part: np.stack(joint_state) for joint_part, joint_state in state.items()}),
+                headers={"Content-Type": gr00t_transport.BINARY_CONTENT_TYPE, "Accept": gr00t_transport.BINARY_CONTENT_TYPE},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            actions = gr00t_transport.decode_actions(response.content)
+            outputs = [{name: value[batch_idx] for name, value in actions.items()} for batch_idx in range(len(payloads))]
+        else:
+            raise ValueError(f"unknown wire format: {self.wire_format}")
+        self.call_latencies.append(time.perf_counter() - start)
+        return outputs
+    
+    def latency_summary(self) -> dict:
+        """
+        milliseconds; the first call includes the connection setup, the rest reuse it
+        """
+        if not self.call_latencies:
+            return {"calls": 0}
+        latencies = np.array(self.call_latencies) * 1000
+        return {
+            "calls": len(latencies),
+            "first_ms": float(latencies[0]),
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        }
+    
+    def close(self):
+        self.session.close()
+
+
+class Gr00tStreamClient:
+    """
+    same interface as Gr00tInferenceClient over the server's persistent websocket (/ws) with framed binary messages
+    submit() / receive() allow several requests in flight (pipelining), infer() is one blocking round trip
+    """
+    wire_format = "binary"
+    
+    def __init__(self, url = "ws://localhost:9876/ws", timeout: float = 10.0):
+        from websockets.sync.client import connect # only needed for the streaming transport
+        self.url = url
+        self.timeout = timeout
+        # no permessage-deflate: compressing raw frames costs more than sending them on the same host
+        self.connection = connect(url, max_size=None, open_timeout=timeout, compression=None)
+        self.call_latencies = []
+        self.next_id = 0
+        self.submit_times = {}
+        self.received = {} # responses that arrived while waiting for another id
+    
+    def submit(self, payload: dict) -> int:
+        request_id = self.next_id
+        self.next_id += 1
+        self.submit_times[request_id] = time.perf_counter()
+        self.connection.send(gr00t_transport.encode_stream_request(request_id, payload["task"], payload["obs"], payload["state"]))
+        return request_id
+    
+    def receive(self, request_id: int) -> dict:
+        while request_id not in self.received:
+            response_id, actions, error = gr00t_transport.decode_stream_response(self.connection.recv(timeout=self.timeout))
+            self.received[response_id] = (actions, error)
+        actions, error = self.received.pop(request_id)
+        self.call_latencies.append(time.perf_counter() - self.submit_times.pop(request_id))
+        if error is not None:
+            raise RuntimeError(f"inference failed on the server: {error}")
+        return actions
+    
+    def infer(self, payload: dict) -> dict:
+        return self.receive(self.submit(payload))
+    
+    latency_summary = Gr00tInferenceClient.latency_summary
+    
+    def close(self):
+        self.connection.close()
+
+
+class Gr00tShmClient:
+    """
+    same interface as Gr00tInferenceClient over a shared memory ring (shm_transport) for a server on the same host
+    submit() / receive() allow up to num_slots requests in flight, infer() is one blocking round trip
+    """
+    wire_format = "binary"
+
+    def __init__(self, socket_path: str = "/tmp/gr00t_inference.sock", num_slots: int = 4, timeout: float = 10.0):
+        self.num_slots = num_slots
+        self.memory, self.slots = shm_transport.create_ring(num_slots)
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+        self.connection.connect(socket_path)
+        shm_transport.send_handshake(self.connection, self.memory, num_slots)
+        self.call_latencies = []
+        self.next_seq = 0
+        self.in_flight = {} # seq -> (slot index, submit time)
+        self.done = set()
+        self.free_slots = list(range(num_slots))
+
+    def submit(self, payload: dict) -> int:
+        if not self.free_slots:
+            raise RuntimeError(f"more than {self.num_slots} requests in flight")
+        slot_index = self.free_slots.pop(0)
+        seq = self.next_seq
+        self.next_seq += 1
+        self.slots[slot_index].write_request(payload["task"], payload["obs"], payload["state"])
+        self.in_flight[seq] = (slot_index, time.perf_counter())
+        self.connection.sendall(shm_transport.DOORBELL.pack(slot_index, seq))
+        return seq
+
+    def receive(self, seq: int) -> dict:
+        while seq not in self.done:
+            _, done_seq = shm_transport.DOORBELL.unpack(shm_transport.recv_exactly(self.connection, shm_transport.DOORBELL.size))
+            self.done.add(done_seq)
+        self.done.discard(seq)
+        slot_index, submit_time = self.in_flight.pop(seq)
+        try:
+            actions = self.slots[slot_index].read_actions()
+        finally:
+            self.free_slots.append(slot_index)
+            self.call_latencies.append(time.perf_counter() - submit_time)
+        return actions
+
+    def infer(self, payload: dict) -> dict:
+        return self.receive(self.submit(payload))
+
+    latency_summary = Gr00tInferenceClient.latency_summary
+
+    def close(self):
+        self.connection.close()
+        self.slots = []
+        self.memory.close()
+        self.memory.unlink()
+
+
+class ChunkPrefetcher:
+    """
+    sends the next inference request on a background thread while the current chunk is still being executed
+    result() blocks only for whatever part of the round trip is not yet done, and returns (output, stall seconds)
+    """
+    def __init__(self, client: Gr00tInferenceClient):
+        self.client = client
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
     
+    def submit(self, payload: dict):
+        self.future = self.executor.submit(self.client.infer, payload)
     
+    def pending(self) -> bool:
+        return self.future is not None
     
-def request_gr00t_inference(payload: dict, url = "http://localhost:9876/inference") -> dict:
-    response = requests.post(url, json=payload)
-    return response.json()
+    def result(self) -> tuple:
+        start = time.perf_counter()
+        output = self.future.result()
+        self.future = None
+        return output, time.perf_counter() - start
+    
+    def discard(self):
+        """
+        drops the pending request (e.g. when an episode is aborted): one that has not been sent yet is cancelled,
+        one already in flight is waited for (at most the client timeout) and its result ignored, because the client
+        is not thread-safe and must be idle before the caller uses it again
+        """
+        if self.future is None:
+            return
+        if not self.future.cancel():
+            try:
+                self.future.result()
+            except Exception:
+                pass
+        self.future = None
+    
+    def close(self):
+        self.discard()
+        self.executor.shutdown()
+
+
+_default_clients = {}
+
+
+def request_gr00t_inference(payload: dict, url = "http://localhost:9876/inference", wire_format: str = "json") -> dict:
+    """
+    thin wrapper around a Gr00tInferenceClient shared per (url, wire_format)
+    """
+    key = (url, wire_format)
+    if key not in _default_clients:
+        _default_clients[key] = Gr00tInferenceClient(url=url, wire_format=wire_format)
+    return _default_clients[key].infer(payload)
+
+
+def request_gr00t_batch_inference(payloads: list, url = "http://localhost:9876/inference_batch", wire_format: str = "json") -> list:
+    """
+    batched version of request_gr00t_inference, one output dict per payload
+    """
+    key = (url, wire_format)
+    if key not in _default_clients:
+        _default_clients[key] = Gr00tInferenceClient(url=url, wire_format=wire_format, batch_url=url)
+    return _default_clients[key].infer_batch(payloads)
 
 
 
@@ -44,3 +330,13 @@ def make_joint_position_from_gr00t_output(output: dict, timestep=1) -> np.ndarra
 
     
     return joint_positions
+
+
+
+def make_joint_trajectory_from_gr00t_output(output: dict, out: np.ndarray = None) -> np.ndarray:
+    """
+    converts a whole action chunk into joint positions at once, row t equals make_joint_position_from_gr00t_output(output, timestep=t)
+    output: "action.<joint part>" -> (16, joint num)
+    out: optional preallocated (16, 54) buffer, only the gr00t joint columns are written so it can be reused across chunks
+    """
+    return gr1_config.gr00t_joint_map.unpack_actions(output, out=out)
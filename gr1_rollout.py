@@ -0,0 +1,148 @@
+import time
+import numpy as np
+import gr1_gr00t_utils
+import gr1_config
+from action_executor import ActionExecutor, AdaptiveHorizon
+from gr1_env import Gr1Env
+from loop_tracer import LoopTracer
+
+
+# the closed control loop, independent of the simulator backend
+
+
+def run_episode(env: Gr1Env, client: gr1_gr00t_utils.Gr00tInferenceClient, task: str, episode_len: int, seed: int = None, video=None, prefetch_step: int = None, verbose: bool = False, tracer: LoopTracer = None, executor: ActionExecutor = None, horizon: int = 16, adaptive_horizon: AdaptiveHorizon = None, recorder=None) -> dict:
+    """
+    runs episode_len inference cycles, each executing the first `horizon` policy steps (1-16) of its chunk before replanning
+    video: optional cv2.VideoWriter or AsyncVideoRecorder, gets every rendered frame
+    prefetch_step: if set, the next observation is sent to the server at this timestep of the current cycle
+    (at the latest one step before its end) and its chunk is applied when the current cycle finishes (pipelined mode)
+    tracer: optional LoopTracer, times every stage of the loop
+    executor: optional ActionExecutor (temporal ensembling, executor.substeps physics steps per policy step),
+    by default every chunk row is applied for one physics step
+    horizon: policy steps executed per chunk, by default the whole chunk (chunks back to back, nothing is blended);
+    a shorter horizon overlaps consecutive chunks, which the executor ensembles (and runs more inference calls per physics step)
+    adaptive_horizon: optional AdaptiveHorizon, chooses the horizon of every cycle from the measured latency and tracking error
+    recorder: optional lerobot_recorder.LeRobotRecorder, records (frame, joint positions, commanded action) of every applied action
+    as one dataset episode, an episode that raises is discarded
+    returns per-episode statistics
+    """
+    if tracer is None:
+        tracer = LoopTracer(enabled=False)
+    frame_preparer = gr1_gr00t_utils.FramePreparer(height=env.camera_height) # reused frame buffers
+    joint_trajectory = np.zeros(shape=(16, 54), dtype=float) # reused for every chunk
+    joint_target = np.zeros(shape=(54, ), dtype=float)
+    if executor is None:
+        executor = ActionExecutor(joint_num=54)
+    executor.reset()
+    substeps = executor.substeps
+    chunk_start = 0 # policy step of the current chunk
+    if not 1 <= horizon <= len(joint_trajectory):
+        raise ValueError(f"horizon must be within 1-{len(joint_trajectory)}, got {horizon}")
+    if adaptive_horizon is not None:
+        adaptive_horizon.reset()
+        horizon = adaptive_horizon.horizon
+    gr00t_joint_index = gr1_config.gr00t_joint_map.index
+    horizons = [] # chosen horizon per cycle
+    tracking_errors = []
+    prefetcher = gr1_gr00t_utils.ChunkPrefetcher(client)
+    as_json = client.wire_format == "json"
+    first_call_idx = len(client.call_latencies)
+    stall_time = 0.0 # time the simulator waited on the policy server
+    inference_time = 0.0 # total round-trip time of the requests whose chunk was used
+    start = time.perf_counter()
+
+    env.reset(seed=seed)
+    if recorder is not None:
+        recorder.start_episode(task)
+    recorded_episode_index = None
+    physics_steps = 0
+    try:
+        for step in range(episode_len):
+            with tracer.span("physics"):
+                env.step()
+            physics_steps += 1
+            with tracer.span("render"):
+                obs = env.get_camera_rgba()
+            if video is not None:
+                with tracer.span("video"):
+                    video.write(frame_preparer.bgr(obs))
+
+            joint_positions = env.get_joint_positions()
+            # nothing has been commanded before the first cycle, there is no tracking error to measure yet
+            tracking_error = float(np.abs(joint_positions[gr00t_joint_index] - joint_target[gr00t_joint_index]).mean()) if step > 0 else None
+
+            # inference to gr00t server
+            if prefetcher.pending():
+                # requested at prefetch_step of the previous chunk, only wait for the rest of the round trip
+                with tracer.span("inference"):
+                    gr00t_output, chunk_stall_time = prefetcher.result()
+            else:
+                if verbose:
+                    print(f"step {step} calling gr00t inference")
+                with tracer.span("preprocess"):
+                    gr00t_inference_input = gr1_gr00t_utils.make_gr00t_input(task=task, obs=frame_preparer.square_rgb(obs), joint_positions=joint_positions, as_json=as_json)
+                with tracer.span("inference"):
+                    gr00t_output = client.infer(gr00t_inference_input)
+                chunk_stall_time = client.call_latencies[-1]
+            stall_time += chunk_stall_time
+            inference_time += client.call_latencies[-1]
+            if tracking_error is not None:
+                if adaptive_horizon is not None:
+                    horizon = adaptive_horizon.update(client.call_latencies[-1], tracking_error)
+                tracking_errors.append(tracking_error)
+            horizons.append(horizon)
+            if verbose:
+                print(f"step {step} horizon {horizon} (latency {client.call_latencies[-1] * 1000:.1f} ms" + (f", tracking error {tracking_error:.4f} rad)" if tracking_error is not None else ")"))
+
+            with tracer.span("decode"):
+                gr1_gr00t_utils.make_joint_trajectory_from_gr00t_output(gr00t_output, out=joint_trajectory)
+                executor.add_chunk(joint_trajectory, start=chunk_start)
+            chunk_physics_steps = horizon * substeps
+            prefetch_idx = min(prefetch_step * substeps, chunk_physics_steps - 2) if prefetch_step is not None else None
+            for physics_idx in range(chunk_physics_steps):
+                with tracer.span("apply"):
+                    env.apply_joint_positions(executor.physics_action(chunk_start * substeps + physics_idx, out=joint_target))
+                if recorder is not None:
+                    with tracer.span("record"):
+                        recorder.add_frame(obs, env.get_joint_positions(), joint_target)
+                if physics_idx == chunk_physics_steps - 1: break # at the end, do not step, as it will be done by the outer loop
+                with tracer.span("physics"):
+                    env.step()
+                physics_steps += 1
+                with tracer.span("render"):
+                    obs = env.get_camera_rgba()
+                if video is not None:
+                    with tracer.span("video"):
+                        video.write(frame_preparer.bgr(obs))
+                if prefetch_step is not None and physics_idx == prefetch_idx and step < episode_len - 1:
+                    if verbose:
+                        print(f"step {step} prefetching gr00t inference")
+                    # the square frame buffer is not touched again until this request has been collected
+                    with tracer.span("preprocess"):
+                        gr00t_inference_input = gr1_gr00t_utils.make_gr00t_input(task=task, obs=frame_preparer.square_rgb(obs), joint_positions=env.get_joint_positions(), as_json=as_json)
+                    prefetcher.submit(gr00t_inference_input)
+            chunk_start += horizon
+        if recorder is not None:
+            recorded_episode_index = recorder.end_episode()
+    finally:
+        prefetcher.close()
+        if recorder is not None:
+            recorder.discard_episode() # no-op once the episode has been published
+
+    latencies = np.array(client.call_latencies[first_call_idx:]) * 1000
+    return {
+        "seed": seed,
+        "chunks": episode_len,
+        "physics_steps": physics_steps,
+        "duration_s": time.perf_counter() - start,
+        # None when no inference ran (episode_len=0)
+        "inference_mean_ms": float(latencies.mean()) if len(latencies) else None,
+        "inference_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "stall_s": stall_time,
+        "stall_removed_s": inference_time - stall_time,
+        "horizon_mean": float(np.mean(horizons)) if horizons else None,
+        "horizons": horizons,
+        "tracking_error_mean": float(np.mean(tracking_errors)) if tracking_errors else None,
+        "recorded_episode_index": recorded_episode_index,
+        "final_joint_positions": env.get_joint_positions().tolist(),
+    }
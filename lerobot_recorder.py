@@ -0,0 +1,292 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+import contextlib
+import cv2
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import gr1_config
+import gr1_gr00t_utils
+from video_recorder import AsyncVideoRecorder
+
+
+# records simulator rollouts as a LeRobot (v2) dataset that LeRobotSingleDataset / run_finetune.py can load:
+# <root>/data/chunk-000/episode_000000.parquet    observation.state, action (packed gr00t joints), task index, timestamps
+# <root>/videos/chunk-000/observation.images.ego_view/episode_000000.mp4    the 256x256 frames the policy saw
+# <root>/meta/info.json, episodes.jsonl, tasks.jsonl, modality.json
+# meta/stats.json is not written: LeRobotSingleDataset computes it when the dataset is first loaded, and publishing an
+# episode deletes it, so statistics of fewer episodes are never used for normalization
+# an episode is streamed into a private staging directory (parquet row groups + background video encoding) and is
+# published under an exclusive file lock when it ends, so several rollout processes can record into the same root;
+# episode and frame indexes are only assigned at publish time, an aborted episode leaves no trace in the dataset
+# a recording process holds a lock on its staging directory; staging directories left unlocked by killed processes are
+# removed when a recorder is opened
+
+CODEBASE_VERSION = "v2.0"
+CHUNKS_SIZE = 1000 # episodes per chunk directory
+VIDEO_KEY = "observation.images.ego_view"
+DATA_PATH = "data/chunk-{episode_chunk:03d}/episode_{episode_index:06d}.parquet"
+VIDEO_PATH = "videos/chunk-{episode_chunk:03d}/{video_key}/episode_{episode_index:06d}.mp4"
+STALE_STAGING_AGE_S = 60.0 # younger staging directories may not be locked by their (starting) process yet
+_JOINT_MAP = gr1_config.gr00t_joint_map
+_STATE_SIZE = len(_JOINT_MAP.index)
+
+_STAGED_SCHEMA = pa.schema([
+    ("observation.state", pa.list_(pa.float64(), _STATE_SIZE)),
+    ("action", pa.list_(pa.float64(), _STATE_SIZE)),
+    ("timestamp", pa.float64()),
+    ("frame_index", pa.int64()),
+    ("annotation.human.action.task_description", pa.int64()),
+    ("task_index", pa.int64()),
+    ("next.done", pa.bool_()),
+])
+_SCHEMA = _STAGED_SCHEMA.append(pa.field("episode_index", pa.int64())).append(pa.field("index", pa.int64()))
+
+
+class LeRobotRecorder:
+    """
+    recorder = LeRobotRecorder(root, fps=30)
+    recorder.start_episode(task)
+    recorder.add_frame(obs_rgba, joint_positions, joint_target) # every applied action
+    recorder.end_episode() # -> episode index (or recorder.discard_episode())
+    rows_per_group: rows buffered before a parquet row group is written (memory bound of an episode)
+    """
+    def __init__(self, root: str, fps: float = 30.0, camera_height: int = 200, robot_type: str = "GR1ArmsOnly", rows_per_group: int = 256):
+        self.root = root
+        self.fps = fps
+        self.robot_type = robot_type
+        self.rows_per_group = rows_per_group
+        self.frame_preparer = gr1_gr00t_utils.FramePreparer(height=camera_height)
+        self.meta_dir = os.path.join(root, "meta")
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self.staging_root = os.path.join(root, ".staging")
+        os.makedirs(self.staging_root, exist_ok=True)
+        with self._locked():
+            self._write_static_meta()
+        self._remove_stale_staging()
+        self.staging_dir = None
+        self.staging_lock = None
+
+    def _remove_stale_staging(self):
+        for entry in os.listdir(self.staging_root):
+            staging_dir = os.path.join(self.staging_root, entry)
+            try:
+                if time.time() - os.stat(staging_dir).st_mtime < STALE_STAGING_AGE_S:
+                    continue
+                lock_fd = os.open(os.path.join(staging_dir, ".lock"), os.O_RDWR)
+            except FileNotFoundError: # removed meanwhile, or killed before it was locked
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                continue
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError: # a live recorder
+                continue
+            finally:
+                os.close(lock_fd)
+            print(f"removing stale staging directory: {staging_dir}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(os.path.join(self.meta_dir, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_static_meta(self):
+        modality_path = os.path.join(self.meta_dir, "modality.json")
+        parts = {joint_part_name: {"start": part_slice.start, "end": part_slice.stop} for joint_part_name, part_slice in _JOINT_MAP.part_slices.items()}
+        modality = {
+            "state": parts,
+            "action": parts,
+            "video": {"ego_view": {"original_key": VIDEO_KEY}},
+            "annotation": {"human.action.task_description": {"original_key": "task_index"}},
+        }
+        if not os.path.exists(modality_path):
+            _write_json(modality_path, modality)
+        elif _read_json(modality_path) != modality:
+            # appending episodes with another joint layout would silently corrupt the dataset
+            raise ValueError(f"{self.root} was recorded with another joint layout (meta/modality.json differs), record into a new root")
+        if not os.path.exists(os.path.join(self.meta_dir, "info.json")):
+            _write_json(os.path.join(self.meta_dir, "info.json"), self._info(total_episodes=0, total_frames=0, total_tasks=0))
+
+    def _info(self, total_episodes: int, total_frames: int, total_tasks: int) -> dict:
+        joint_names = [joint_name for joint_names in gr1_config.gr1_gr00t_joint_space.values() for joint_name in joint_names]
+        return {
+            "codebase_version": CODEBASE_VERSION,
+            "robot_type": self.robot_type,
+            "total_episodes": total_episodes,
+            "total_frames": total_frames,
+            "total_tasks": total_tasks,
+            "total_videos": total_episodes,
+            "total_chunks": (total_episodes + CHUNKS_SIZE - 1) // CHUNKS_SIZE,
+            "chunks_size": CHUNKS_SIZE,
+            "fps": self.fps,
+            "splits": {"train": f"0:{total_episodes}"},
+            "data_path": DATA_PATH,
+            "video_path": VIDEO_PATH,
+            "features": {
+                VIDEO_KEY: {
+                    "dtype": "video",
+                    "shape": [256, 256, 3],
+                    "names": ["height", "width", "channel"],
+                    "video_info": {"video.fps": self.fps, "video.codec": "mp4v", "video.pix_fmt": "yuv420p", "video.is_depth_map": False, "has_audio": False},
+                },
+                "observation.state": {"dtype": "float64", "shape": [_STATE_SIZE], "names": joint_names},
+                "action": {"dtype": "float64", "shape": [_STATE_SIZE], "names": joint_names},
+                "timestamp": {"dtype": "float64", "shape": [1]},
+                "annotation.human.action.task_description": {"dtype": "int64", "shape": [1]},
+                "task_index": {"dtype": "int64", "shape": [1]},
+                "episode_index": {"dtype": "int64", "shape": [1]},
+                "index": {"dtype": "int64", "shape": [1]},
+                "next.done": {"dtype": "bool", "shape": [1]},
+            },
+        }
+
+    def start_episode(self, task: str):
+        if self.staging_dir is not None:
+            raise RuntimeError("episode already started")
+        self.task = task
+        self.staging_dir = os.path.join(self.staging_root, uuid.uuid4().hex)
+        os.makedirs(self.staging_dir)
+        self.staging_lock = open(os.path.join(self.staging_dir, ".lock"), "w")
+        fcntl.flock(self.staging_lock, fcntl.LOCK_EX)
+        self.writer = pq.ParquetWriter(os.path.join(self.staging_dir, "episode.parquet"), _STAGED_SCHEMA)
+        self.video = AsyncVideoRecorder(os.path.join(self.staging_dir, "episode.mp4"), self.fps, (256, 256))
+        self.frame_count = 0
+        self.states = np.zeros(shape=(self.rows_per_group, _STATE_SIZE), dtype=float)
+        self.actions = np.zeros(shape=(self.rows_per_group, _STATE_SIZE), dtype=float)
+        self.buffered = 0
+        self.bgr_frame = np.zeros(shape=(256, 256, 3), dtype=np.uint8)
+
+    def add_frame(self, obs: np.ndarray, joint_positions: np.ndarray, action: np.ndarray):
+        """
+        obs: (camera height, 256, 4) rgba camera frame, padded to the square policy input
+        joint_positions, action: (54, ) observed and commanded positions, only the gr00t joints are stored
+        """
+        self.video.write(cv2.cvtColor(self.frame_preparer.square_rgb(obs), cv2.COLOR_RGB2BGR, dst=self.bgr_frame))
+        self.states[self.buffered] = joint_positions[_JOINT_MAP.index]
+        self.actions[self.buffered] = action[_JOINT_MAP.index]
+        self.buffered += 1
+        self.frame_count += 1
+        if self.buffered == self.rows_per_group:
+            self._flush(done=False)
+
+    def _flush(self, done: bool):
+        count = self.buffered
+        if count == 0:
+            return
+        frame_index = np.arange(self.frame_count - count, self.frame_count)
+        next_done = np.zeros(shape=(count, ), dtype=bool)
+        next_done[-1] = done
+        self.writer.write_table(pa.table({
+            "observation.state": _fixed_list(self.states[:count]),
+            "action": _fixed_list(self.actions[:count]),
+            "timestamp": frame_index / self.fps,
+            "frame_index": frame_index,
+            "annotation.human.action.task_description": np.full(count, -1), # task index is assigned on publish
+            "task_index": np.full(count, -1),
+            "next.done": next_done,
+        }, schema=_STAGED_SCHEMA))
+        self.buffered = 0
+
+    def discard_episode(self):
+        if self.staging_dir is None:
+            return
+        try:
+            self.writer.close()
+            self.video.release()
+        except Exception: # the episode is thrown away anyway (e.g. after its video encoding failed)
+            pass
+        finally:
+            self._remove_staging()
+
+    def _remove_staging(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_lock.close()
+        self.staging_dir = None
+        self.staging_lock = None
+
+    def end_episode(self) -> int:
+        """
+        publishes the staged episode into the dataset, returns its episode index (None for an empty episode)
+        """
+        if self.staging_dir is None:
+            raise RuntimeError("no episode started")
+        if self.frame_count == 0:
+            self.discard_episode()
+            return None
+        self._flush(done=True)
+        self.writer.close()
+        self.video.release()
+        with self._locked():
+            info = _read_json(os.path.join(self.meta_dir, "info.json"))
+            episode_index = info["total_episodes"]
+            frame_offset = info["total_frames"]
+            task_index, total_tasks = self._task_index(self.task, info["total_tasks"])
+            path_args = {"episode_chunk": episode_index // CHUNKS_SIZE, "episode_index": episode_index}
+            data_path = os.path.join(self.root, DATA_PATH.format(**path_args))
+            video_path = os.path.join(self.root, VIDEO_PATH.format(video_key=VIDEO_KEY, **path_args))
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            os.makedirs(os.path.dirname(video_path), exist_ok=True)
+            # one row group at a time, the episode is never fully in memory
+            staged = pq.ParquetFile(os.path.join(self.staging_dir, "episode.parquet"))
+            with pq.ParquetWriter(data_path + ".tmp", _SCHEMA) as writer:
+                for group_idx in range(staged.num_row_groups):
+                    table = staged.read_row_group(group_idx)
+                    count = table.num_rows
+                    frame_index = table.column("frame_index").to_numpy()
+                    table = table.set_column(table.schema.get_field_index("annotation.human.action.task_description"), "annotation.human.action.task_description", pa.array(np.full(count, task_index)))
+                    table = table.set_column(table.schema.get_field_index("task_index"), "task_index", pa.array(np.full(count, task_index)))
+                    table = table.append_column("episode_index", pa.array(np.full(count, episode_index)))
+                    table = table.append_column("index", pa.array(frame_offset + frame_index))
+                    writer.write_table(table)
+            os.replace(data_path + ".tmp", data_path)
+            os.replace(os.path.join(self.staging_dir, "episode.mp4"), video_path)
+            with open(os.path.join(self.meta_dir, "episodes.jsonl"), "a") as f:
+                f.write(json.dumps({"episode_index": episode_index, "tasks": [self.task], "length": self.frame_count}) + "\n")
+            _write_json(os.path.join(self.meta_dir, "info.json"), self._info(total_episodes=episode_index + 1, total_frames=frame_offset + self.frame_count, total_tasks=total_tasks))
+            with contextlib.suppress(FileNotFoundError): # stale now, recomputed by the next loader
+                os.unlink(os.path.join(self.meta_dir, "stats.json"))
+        self._remove_staging()
+        return episode_index
+
+    def _task_index(self, task: str, total_tasks: int) -> tuple:
+        """
+        looks the task up in tasks.jsonl and appends it if new (called under the lock), returns (task index, total tasks)
+        """
+        tasks_path = os.path.join(self.meta_dir, "tasks.jsonl")
+        if os.path.exists(tasks_path):
+            with open(tasks_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["task"] == task:
+                        return entry["task_index"], total_tasks
+        with open(tasks_path, "a") as f:
+            f.write(json.dumps({"task_index": total_tasks, "task": task}) + "\n")
+        return total_tasks, total_tasks + 1
+
+    def close(self):
+        self.discard_episode()
+
+
+def _fixed_list(values: np.ndarray) -> pa.Array:
+    return pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)), values.shape[1])
+
+
+def _read_json(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: dict):
+    # atomic, readers never see a half written file
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,107 @@
+import csv
+import json
+import time
+import numpy as np
+
+
+# named timing spans for the closed control loop
+# with tracer.span("physics"):
+#     env.step()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.tracer.events.append((self.tracer.episode, self.name, self.start, end - self.start))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class LoopTracer:
+    """
+    collects (episode, stage name, start, duration) events; when disabled, span() returns a shared no-op context
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.episode = 0
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def start_episode(self, episode: int):
+        self.episode = episode
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def summary(self) -> dict:
+        """
+        episode -> stage name -> count and latency statistics in milliseconds
+        """
+        durations = {}
+        for episode, name, _, duration in self.events:
+            durations.setdefault(episode, {}).setdefault(name, []).append(duration)
+        summary = {}
+        for episode, stages in durations.items():
+            summary[episode] = {}
+            for name, values in stages.items():
+                values = np.array(values) * 1000
+                summary[episode][name] = {
+                    "count": len(values),
+                    "total_ms": float(values.sum()),
+                    "mean_ms": float(values.mean()),
+                    "p50_ms": float(np.percentile(values, 50)),
+                    "p95_ms": float(np.percentile(values, 95)),
+                    "p99_ms": float(np.percentile(values, 99)),
+                }
+        return summary
+
+    def print_summary(self, episode: int):
+        stages = self.summary().get(episode, {})
+        for name, stats in sorted(stages.items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"  {name:>12}: n={stats['count']:5d}  total {stats['total_ms']:9.1f} ms  p50 {stats['p50_ms']:8.3f}  p95 {stats['p95_ms']:8.3f}  p99 {stats['p99_ms']:8.3f} ms")
+
+    def export_summary_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump({str(episode): stages for episode, stages in self.summary().items()}, f, indent=2)
+
+    def export_csv(self, path: str):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["episode", "stage", "start_ms", "duration_ms"])
+            for episode, name, start, duration in self.events:
+                writer.writerow([episode, name, (start - self.origin) * 1000, duration * 1000])
+
+    def export_chrome_trace(self, path: str):
+        """
+        open in chrome://tracing or https://ui.perfetto.dev, one row per episode
+        """
+        trace_events = [
+            {"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": duration * 1e6, "pid": 0, "tid": episode}
+            for episode, name, start, duration in self.events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,95 @@
+# evaluates a checkpoint by fanning episodes out over several headless simulator processes
+# all processes share one inference server (run_inference_server.py); --set simulation.backend=fake runs without Isaac Sim
+
+import dataclasses
+import json
+import os
+import time
+import multiprocessing
+
+import experiment_config
+
+
+# the parameters are in experiment_config.py: scenes, seeds and processes in EvaluationConfig, the episodes in SimulationConfig
+# python run_batch_evaluation.py --preset NutPouring --set evaluation.process_num=2 --set simulation.record.enabled=true
+
+
+def run_scene(job: dict) -> list:
+    """
+    runs all episodes of one scene in this process with a single simulator instance
+    a failure is recorded in the results of the episode (or of every episode, when the scene cannot be set up)
+    """
+    # imported here, so isaacsim is only ever loaded inside the worker processes
+    import gr1_rollout, run_simulation
+    from video_recorder import AsyncVideoRecorder
+    config, evaluation = job["config"].simulation, job["config"].evaluation
+    scene_name = os.path.splitext(os.path.basename(job["usd_path"]))[0]
+    env = None
+    recorder = None
+    client = None
+    results = []
+    try:
+        try:
+            env = run_simulation.make_env(dataclasses.replace(config, world_file=job["usd_path"], headless=True))
+            if config.record.enabled: # all processes record their episodes into one LeRobot dataset
+                from lerobot_recorder import LeRobotRecorder
+                recorder = LeRobotRecorder(config.record.root, fps=config.record.fps, camera_height=config.camera.height)
+            client = run_simulation.make_client(config.inference)
+        except Exception as error:
+            print(f"[{scene_name}] setup failed: {error!r}")
+            return [{"seed": seed, "scene": job["usd_path"], "video": None, "error": f"setup failed: {error!r}"} for seed in job["seeds"]]
+        for seed in job["seeds"]:
+            print(f"[{scene_name}] starting seed {seed}")
+            video = None
+            video_file = None
+            try:
+                if evaluation.save_video:
+                    video_file = os.path.join(evaluation.result_dir, f"{scene_name}_seed{seed}.mp4")
+                    video = AsyncVideoRecorder(video_file, 30, (256, config.camera.height), queue_size=config.video.queue_size, drop_policy=config.video.drop_policy, every_k=evaluation.video_every_k_frames, scale=config.video.scale)
+                result = gr1_rollout.run_episode(env, client, task=config.task, episode_len=config.episode_len, seed=seed, video=video, horizon=config.execution.replan_horizon, recorder=recorder)
+            except Exception as error:
+                result = {"seed": seed, "error": repr(error)}
+            if video is not None:
+                try:
+                    video.release()
+                except Exception as error:
+                    result.setdefault("error", f"video: {error!r}")
+            result.update({"scene": job["usd_path"], "video": video_file})
+            results.append(result)
+            print(f"[{scene_name}] seed {seed} {'failed: ' + result['error'] if 'error' in result else 'finished'}")
+    finally:
+        for resource in (recorder, client, env):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception as error:
+                    print(f"[{scene_name}] closing {type(resource).__name__} failed: {error!r}")
+    return results
+
+
+def main(config: experiment_config.ExperimentConfig):
+    evaluation = config.evaluation
+    os.makedirs(evaluation.result_dir, exist_ok=True)
+    # the config travels with every job, spawned workers do not see the command line
+    jobs = [{"usd_path": usd_path, "seeds": evaluation.seeds, "config": config} for usd_path in evaluation.scenes or [config.simulation.world_file]]
+    start = time.perf_counter()
+    # spawn: every worker gets a fresh interpreter for its own SimulationApp, maxtasksperchild=1 as it cannot be reopened
+    with multiprocessing.get_context("spawn").Pool(processes=min(evaluation.process_num, len(jobs)), maxtasksperchild=1) as pool:
+        results = [result for scene_results in pool.imap_unordered(run_scene, jobs) for result in scene_results]
+    summary = {
+        "env_backend": config.simulation.backend,
+        "task": config.simulation.task,
+        "each_episode_len": config.simulation.episode_len,
+        "config": experiment_config.to_dict(config),
+        "wall_time_s": time.perf_counter() - start,
+        "failed_episodes": sum("error" in result for result in results),
+        "episodes": sorted(results, key=lambda result: (result["scene"], result["seed"])),
+    }
+    summary_file = os.path.join(evaluation.result_dir, "summary.json")
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{len(results)} episodes ({summary['failed_episodes']} failed) in {summary['wall_time_s']:.1f}s, summary saved as: {summary_file}")
+
+
+if __name__ == "__main__":
+    main(experiment_config.from_cli(description="evaluate a checkpoint over several scenes and seeds in parallel simulator processes"))
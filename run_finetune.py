@@ -4,96 +4,102 @@
 import warnings
 from gr00t.experiment.data_config import DATA_CONFIG_MAP
 from gr00t.data.schema import EmbodimentTag
-from gr00t.data.dataset import LeRobotSingleDataset, LeRobotMixtureDataset
 import torch
 from gr00t.model.gr00t_n1 import GR00T_N1_5
 from transformers import TrainingArguments
 from gr00t.experiment.runner import TrainRunner
 
+import experiment_config
+from dataset_index_cache import CachedIndexLeRobotDataset, CachedIndexFrameCachedDataset
+from dataset_mixture import make_mixture_dataset
 
 
-PRE_TRAINED_MODEL_PATH = "nvidia/GR00T-N1.5-3B"
-EMBODIMENT_TAG = EmbodimentTag.GR1
-EMBODIMENT_CONFIG = "fourier_gr1_arms_only"
-TUNE_LLM = False            
-TUNE_VISUAL = False          
-TUNE_PROJECTOR = True      
-TUNE_DIFFUSION_MODEL = False 
-DATASET_PATH = "/media/daniel/new_disk/RFM/datasets/gr1_arms_only.Exhaust_pipe_sorting_task"
-DATASET_VIDEO_BACKEND = "decord" # torchvision_av #this is important!
-MODEL_COMPUTE_DTYPE = "bfloat16"
-FINETUNED_OUTPUT_DIRECTORY = "/media/daniel/new_disk/RFM/models/gr1_arms_only.Exhaust_pipe_sort_batch32_nodiffusion"
-BATCH_SIZE = 32
-MAX_STEPS = 40000
-SAVE_STEPS = 10000 # save the model in this steps
-GRADIENT_ACCUMULATION_STEPS = 4
-RUN_NAME = "gr1_arms_only.Exhaust_pipe_sort_batch32_nodiffusion" # for reporting to wandb
-LEARNING_RATE = 1e-4
+# the parameters are in experiment_config.FinetuneConfig: --preset NutPouring|ExhaustPipe|PlateToCardboardBox|ExhaustPipePlusNutPouring, --config file.yaml, --set finetune.key=value
+# without --preset this fine-tunes ExhaustPipe (the NutPouring checkpoint is the one the inference server loads by default, and output_dir is overwritten)
 
 
-
-
-def main(): 
+def main(config: experiment_config.FinetuneConfig):
     device: str = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Device: {device}")
     warnings.simplefilter("ignore", category=FutureWarning)
-    data_config = DATA_CONFIG_MAP[EMBODIMENT_CONFIG]
+    data_config = DATA_CONFIG_MAP[config.embodiment_config]
     modality_config = data_config.modality_config()
     modality_transform = data_config.transform()
 
 
-    train_dataset = LeRobotSingleDataset(
-        dataset_path=DATASET_PATH,
-        modality_configs=modality_config,
-        embodiment_tag=EMBODIMENT_TAG,
-        video_backend=DATASET_VIDEO_BACKEND,
-        video_backend_kwargs=None,
-        transforms=modality_transform, # apply transform in the dataset loader
-    )
+    if config.datasets:
+        # several datasets sampled by weight, with normalization statistics merged across them
+        train_dataset = make_mixture_dataset(
+            config.datasets,
+            data_config,
+            embodiment_tag=EmbodimentTag(config.embodiment_tag),
+            video_backend=config.video_backend,
+            balance_dataset_weights=config.balance_dataset_weights,
+            log_every=config.mixture_log_every,
+            index_cache_dir=config.index_cache_dir,
+        )
+        print(f"Training on a mixture of {len(config.datasets)} datasets: " + ", ".join(f"{spec.path} (weight {spec.weight})" for spec in config.datasets))
+    else:
+        # with a frame cache (python frame_cache.py --dataset ... --output ...), frames are read from the memory map instead of decoded
+        # metadata, statistics and the step index are read from the index cache when the dataset did not change
+        dataset_class = CachedIndexLeRobotDataset
+        dataset_kwargs = {"index_cache_dir": config.index_cache_dir}
+        if config.frame_cache_dir is not None:
+            dataset_class = CachedIndexFrameCachedDataset
+            dataset_kwargs["frame_cache_dirs"] = {"video.ego_view": config.frame_cache_dir}
+        train_dataset = dataset_class(
+            dataset_path=config.dataset_path,
+            modality_configs=modality_config,
+            embodiment_tag=EmbodimentTag(config.embodiment_tag),
+            video_backend=config.video_backend,
+            video_backend_kwargs=None,
+            transforms=modality_transform, # apply transform in the dataset loader
+            **dataset_kwargs,
+        )
 
     model = GR00T_N1_5.from_pretrained(
-        pretrained_model_name_or_path=PRE_TRAINED_MODEL_PATH,
-        tune_llm=TUNE_LLM,  # backbone's LLM
-        tune_visual=TUNE_VISUAL,  # backbone's vision tower
-        tune_projector=TUNE_PROJECTOR,  # action head's projector
-        tune_diffusion_model=TUNE_DIFFUSION_MODEL,  # action head's DiT
+        pretrained_model_name_or_path=config.pretrained_model_path,
+        tune_llm=config.tune_llm,  # backbone's LLM
+        tune_visual=config.tune_visual,  # backbone's vision tower
+        tune_projector=config.tune_projector,  # action head's projector
+        tune_diffusion_model=config.tune_diffusion_model,  # action head's DiT
     )
 
 
     # Set the model's compute_dtype to bfloat16
-    model.compute_dtype = MODEL_COMPUTE_DTYPE
-    model.config.compute_dtype = MODEL_COMPUTE_DTYPE
+    model.compute_dtype = config.compute_dtype
+    model.config.compute_dtype = config.compute_dtype
     model.to(device)
 
 
 
     training_args = TrainingArguments(
-        output_dir=FINETUNED_OUTPUT_DIRECTORY,
+        output_dir=config.output_dir,
         overwrite_output_dir=True,
-        run_name=RUN_NAME,
+        run_name=config.run_name,
         remove_unused_columns=False,
         deepspeed="",
         gradient_checkpointing=False,
         bf16=True,
         tf32=True,
-        per_device_train_batch_size=BATCH_SIZE,
-        gradient_accumulation_steps=GRADIENT_ACCUMULATION_STEPS,
-        dataloader_num_workers=16,
+        per_device_train_batch_size=config.batch_size,
+        gradient_accumulation_steps=config.gradient_accumulation_steps,
+        dataloader_num_workers=config.dataloader_num_workers,
         dataloader_pin_memory=False,
         dataloader_persistent_workers=True,
         optim="adamw_torch",
         adam_beta1=0.95,
         adam_beta2=0.999,
         adam_epsilon=1e-8,
-        learning_rate=LEARNING_RATE,
+        learning_rate=config.learning_rate,
         weight_decay=1e-5,
         warmup_ratio=0.05,
         lr_scheduler_type="cosine",
         logging_steps=10.0,
         num_train_epochs=300,
-        max_steps=MAX_STEPS,
+        max_steps=config.max_steps,
         save_strategy="steps",
-        save_steps=SAVE_STEPS,
+        save_steps=config.save_steps,
         save_total_limit=8,
         report_to="wandb",
         seed=42,
@@ -113,4 +119,4 @@ def main():
     
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(experiment_config.from_cli(description="fine-tune GR00T N1.5 on a LeRobot dataset", default_preset="ExhaustPipe").finetune)
\ No newline at end of file
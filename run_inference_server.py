@@ -1,7 +1,4 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
 import uvicorn
-import numpy as np
 
 import os
 import torch
@@ -9,63 +6,34 @@ import gr00t
 from gr00t.model.policy import Gr00tPolicy
 from gr00t.experiment.data_config import DATA_CONFIG_MAP
 
-# Gr00t initialize
-MODEL_PATH = "/media/daniel/new_disk/RFM/models/gr1_arms_only.Nut_pouring_batch32_nodiffusion/checkpoint-10000"
-EMBODIMENT_TAG = "gr1"
-EMBODIMENT_CONFIG = "fourier_gr1_arms_only"
-
-
-
-device = "cuda"
-EMBODIMENT_TAG = "gr1"
-data_config = DATA_CONFIG_MAP[EMBODIMENT_CONFIG]
-modality_config = data_config.modality_config()
-modality_transform = data_config.transform()
-policy = Gr00tPolicy(
-    model_path=MODEL_PATH,
-    embodiment_tag=EMBODIMENT_TAG,
-    modality_config=modality_config,
-    modality_transform=modality_transform,
-    device=device,
-)
-
-# Create a FastAPI app instance
-app = FastAPI()
-
-# Define a Pydantic model for the request body
-class InferenceRequest(BaseModel):
-    task: str
-    obs: list
-    state: dict
-
-
-@app.post("/inference")
-def run_inference(request: InferenceRequest):
-    """
-    Accepts a JSON payload and processes it for inference.
-    """
-    #print(f"Received inference request:")
-    #print(f"  task: {request.task}")
-    #print(f"  obs: {np.array(request.obs, dtype=np.uint8)}")
-    #print(f"  state: {request.state}")
-
-
-    step_data = {}
-    step_data["video.ego_view"] = np.array(request.obs, dtype=np.uint8).reshape((1,256, 256, 3))
-    for joint_part_name, joint_state in request.state.items():
-        step_data[f"state.{joint_part_name}"] = np.array(joint_state, dtype=float).reshape((1, len(joint_state)))
-    step_data["annotation.human.action.task_description"] = [request.task]
-    
-    print(f"Received Task: {request.task}")
-  
-    # run the model
-    predicted_action = policy.get_action(step_data)
-    
-    return_data = {}
-    for name, value in predicted_action.items():
-        return_data[name] = value.tolist()
-    return return_data
+import experiment_config
+import gr00t_server_utils
+
+# the parameters are in experiment_config.ServerConfig: --preset NutPouring|ExhaustPipe|PlateToCardboardBox, --config file.yaml, --set server.key=value
+# max_batch_size: dynamic batching of concurrent /inference requests, 1 turns it off
+# profile_dir: POST /profile?kind=cprofile|torch&requests=N profiles the next N policy calls into this directory, GET /metrics reports timings
+# action_cache_size: LRU cache of action chunks keyed by a hash of (task, obs, state), for deterministic replays
+# keep it off (0) while the action head samples noise, otherwise identical observations would get frozen actions
+# task_cache_size: reuse the tokenization of repeated task texts (the same TASK string is sent with every request), 0 turns it off
+# shm_socket_path: same-host shared memory transport (shm_transport) served alongside HTTP, None turns it off
+
+
+def create_server_app(config: experiment_config.ServerConfig):
+    data_config = DATA_CONFIG_MAP[config.embodiment_config]
+    modality_config = data_config.modality_config()
+    modality_transform = data_config.transform()
+    policy = Gr00tPolicy(
+        model_path=config.model_path,
+        embodiment_tag=config.embodiment_tag,
+        modality_config=modality_config,
+        modality_transform=modality_transform,
+        device=config.device,
+    )
+
+    # Create a FastAPI app instance
+    return gr00t_server_utils.create_app(policy, max_batch_size=config.max_batch_size, max_wait_ms=config.max_batch_wait_ms, profile_dir=config.profile_dir, action_cache_size=config.action_cache_size, action_cache_ttl=config.action_cache_ttl, task_cache_size=config.task_cache_size, shm_socket_path=config.shm_socket_path)
 
 # Optional: Run the server directly using Uvicorn
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=9876)
\ No newline at end of file
+    server_config = experiment_config.from_cli(description="gr00t policy inference server").server
+    uvicorn.run(create_server_app(server_config), host=server_config.host, port=server_config.port)
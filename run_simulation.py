@@ -1,129 +1,101 @@
-# this uses the issacsim conda environment
-
-from isaacsim import SimulationApp
-
-
-# here are the parameters
-EPISODE_NUM = 2
-EACH_EPISODE_LEN = 30
-RESULT_VIDEO_FILE = "./results/NutPouring_batch32_nodiffusion.mp4"
-LOAD_WORLD_FILE = "./environments/gr1_NutPouring.usd"
-#LOAD_WORLD_FILE = "./environments/gr1_exhaust_pipe.usd"
-
-TASK = "Pick up the red beaker and tilt it to pour out 1 green nut into yellow bowl. Pick up the yellow bowl and place it on the metallic measuring scale."
-#TASK = "Pickup the blue pipe and place it into the blue bin." # Exhaust Pipe task
-
-# setting for the camera
-CAMERA_HEIGHT = 200 # width is fixed to 256
-CAMERA_FOCAL_LENGTH = 1.2
-CAMERA_FORWARD_DIST = 0.25 # 0.25 for exhaust pipe
-CAMERA_ANGLE = 70 # 70 for exhaust pipe
-
-INFERENCE_SERVER_URL = "http://localhost:9876/inference"
-
-
-simulation_app = SimulationApp({
-    "headless": False, 
-    "create_new_stage": False,
-    "open_usd" : LOAD_WORLD_FILE,
-    "sync_loads": True, # wait until asset loads
-}) 
-
-from isaacsim.core.api import World
-from isaacsim.core.api.scenes.scene import Scene
-from isaacsim.core.api.robots import Robot
-from isaacsim.core.api.controllers.articulation_controller import ArticulationController
-from isaacsim.sensors.camera.camera import Camera
-import numpy as np
-import isaacsim.core.utils.numpy.rotations as rot_utils
-from isaacsim.core.prims import XFormPrim, RigidPrim
-from isaacsim.core.utils.types import ArticulationAction
-import cv2
-import gr1_config, gr1_gr00t_utils
-
-
-
-
-
-def main():
+# this uses the issacsim conda environment (--set simulation.backend=fake runs without it)
+
+import experiment_config
+import gr1_env, gr1_gr00t_utils, gr1_rollout
+from action_executor import ActionExecutor, AdaptiveHorizon
+from loop_tracer import LoopTracer
+from video_recorder import AsyncVideoRecorder
+
+
+# the parameters are in experiment_config.py: --preset NutPouring|ExhaustPipe|PlateToCardboardBox, --config file.yaml, --set key=value
+
+
+def make_env(config: experiment_config.SimulationConfig) -> gr1_env.Gr1Env:
+    camera = config.camera
+    if config.backend == "isaacsim":
+        return gr1_env.IsaacSimGr1Env(
+            usd_path=config.world_file,
+            headless=config.headless,
+            camera_height=camera.height,
+            camera_focal_length=camera.focal_length,
+            camera_forward_dist=camera.forward_dist,
+            camera_angle=camera.angle,
+            joint_noise=config.initial_joint_noise,
+            object_prims=config.object_prims,
+            object_position_noise=config.object_position_noise,
+        )
+    if config.backend == "fake":
+        return gr1_env.FakeGr1Env(camera_height=camera.height)
+    raise ValueError(f"unknown simulation backend: {config.backend}")
+
+
+def make_client(inference: experiment_config.InferenceClientConfig):
+    if inference.transport == "websocket":
+        return gr1_gr00t_utils.Gr00tStreamClient(url=inference.stream_url, timeout=inference.timeout)
+    if inference.transport == "shm":
+        return gr1_gr00t_utils.Gr00tShmClient(socket_path=inference.shm_socket, timeout=inference.timeout)
+    if inference.transport == "http":
+        return gr1_gr00t_utils.Gr00tInferenceClient(url=inference.server_url, wire_format=inference.wire_format, timeout=inference.timeout, retries=inference.retries)
+    raise ValueError(f"unknown inference transport: {inference.transport}")
+
+
+def main(config: experiment_config.SimulationConfig):
+    camera, video_config, inference, execution, trace = config.camera, config.video, config.inference, config.execution, config.trace
     ## 1. setup scene
     print("## 1. setup scene")
-    world = World()
-    scene: Scene = world.scene
-    gr1: Robot = scene.add(Robot(
-        prim_path="/World/gr1", 
-        name="gr1",
-    ))
-    gr1_articulation_controller: ArticulationController = gr1.get_articulation_controller()
-    
-    # adding camera
-    camera = Camera(
-        prim_path="/World/gr1/head_yaw_link/camera",
-        name="camera",
-        translation=np.array([CAMERA_FORWARD_DIST, 0.0, 0.07]),
-        frequency=60,
-        resolution=(256, CAMERA_HEIGHT),
-        orientation=rot_utils.euler_angles_to_quats(np.array([0, CAMERA_ANGLE, 0]), degrees=True),
-    )
-    camera.set_focal_length(CAMERA_FOCAL_LENGTH) # smaller => wider range of view
-    camera.set_clipping_range(0.1, 2)
-    
-    
-    ## 2. setup_post_load
-    world.reset()
-    print("## 2. setup post-load")
-    camera.initialize()
-    camera.add_motion_vectors_to_frame()
-    gr1_articulation_controller.set_gains(kps = np.array([3000.0]*54), kds = np.array([100.0]*54)) # p is the stiffness, d is the gain
-    
-    
-    ## 3. run simulation
-    print("## 3. run simulation")
-    fourcc = cv2.VideoWriter_fourcc(*'MP4V') 
-    video = cv2.VideoWriter(RESULT_VIDEO_FILE, fourcc, 30, (256, CAMERA_HEIGHT), isColor=True)
-    
-    for episode_idx in range(EPISODE_NUM):
+    env = make_env(config)
+
+
+    ## 2. run simulation
+    print("## 2. run simulation")
+    video = AsyncVideoRecorder(video_config.file, 30, (256, camera.height), queue_size=video_config.queue_size, drop_policy=video_config.drop_policy, every_k=video_config.every_k_frames, scale=video_config.scale)
+    gr00t_client = make_client(inference)
+    tracer = LoopTracer(enabled=trace.enabled)
+    executor = ActionExecutor(joint_num=54, substeps=execution.substeps, ensemble_decay=execution.ensemble_decay, max_chunks=-(-16 // (execution.adaptive_horizon_min if execution.adaptive_horizon else execution.replan_horizon)))
+    recorder = None
+    if config.record.enabled:
+        from lerobot_recorder import LeRobotRecorder # pyarrow is only needed when recording
+        recorder = LeRobotRecorder(config.record.root, fps=config.record.fps, camera_height=camera.height)
+    adaptive_horizon = AdaptiveHorizon(min_horizon=execution.adaptive_horizon_min, max_horizon=execution.adaptive_horizon_max, initial_horizon=execution.replan_horizon, latency_budget_ms=execution.adaptive_latency_budget_ms, tracking_tolerance=execution.adaptive_tracking_tolerance) if execution.adaptive_horizon else None
+
+    for episode_idx in range(config.episode_num):
         print(f"Starting episode {episode_idx}")
-        world.reset()
-        
-        # set gr1 default position
-        gr1.set_joint_positions(positions=gr1_config.default_joint_position)
-        
-        # first, just initialize the world and wait
-        print("Waiting to initialize")
-        for step in range(100):
-            world.step(render=True)
-            
-        # for the actual simulation
-        print("Start episode")
-        for step in range(EACH_EPISODE_LEN):
-            world.step(render=True)
-            obs: np.ndarray = camera.get_rgba()
-            image = obs[:, :, :3]
-            video.write(cv2.cvtColor(image, cv2.COLOR_RGB2BGR)) 
-            current_joint_positions = gr1.get_joint_positions()
-            
-            # inference to gr00t server
-            print(f"Episode {episode_idx} step {step} calling gr00t inference")        
-            gr00t_inference_input = gr1_gr00t_utils.make_gr00t_input(task=TASK, obs=image, joint_positions=current_joint_positions)
-            gr00t_output = gr1_gr00t_utils.request_gr00t_inference(payload=gr00t_inference_input, url=INFERENCE_SERVER_URL)
-            for timestep in range(0, 16):
-                action_joint_position = gr1_gr00t_utils.make_joint_position_from_gr00t_output(gr00t_output, timestep=timestep)
-                gr1_articulation_controller.apply_action(ArticulationAction(joint_positions=action_joint_position))
-                if timestep == 15: break # at the end, do not step, as it will be done by the outer loop
-                world.step(render=True)
-                obs: np.ndarray = camera.get_rgba()
-                image = obs[:, :, :3]
-                video.write(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        tracer.start_episode(episode_idx)
+        result = gr1_rollout.run_episode(
+            env,
+            gr00t_client,
+            task=config.task,
+            episode_len=config.episode_len,
+            video=video,
+            prefetch_step=inference.prefetch_step if inference.prefetch_enabled else None,
+            verbose=True,
+            tracer=tracer,
+            executor=executor,
+            horizon=execution.replan_horizon,
+            adaptive_horizon=adaptive_horizon,
+            recorder=recorder,
+        )
+        print(f"Episode {episode_idx} finished in {result['duration_s']:.2f}s")
+        print(f"Inference latency so far: {gr00t_client.latency_summary()}")
+        if result["horizons"]:
+            print(f"Episode {episode_idx} mean horizon {result['horizon_mean']:.1f}, mean tracking error {result['tracking_error_mean']:.4f} rad")
+        print(f"Episode {episode_idx} stalled {result['stall_s']:.2f}s on inference, prefetching removed {result['stall_removed_s']:.2f}s")
+        if trace.enabled:
+            tracer.print_summary(episode_idx)
 
-            
- 
-        
-        print(f"Episode {episode_idx} finished")
-        
     video.release()
-    simulation_app.close()
+    if recorder is not None:
+        recorder.close()
+        print(f"Rollouts recorded into: {config.record.root}")
+    print(f"Video: {video.written_count} frames written, {video.dropped_count} dropped")
+    if trace.enabled:
+        tracer.export_chrome_trace(f"{trace.output_prefix}_chrome.json")
+        tracer.export_summary_json(f"{trace.output_prefix}_summary.json")
+        tracer.export_csv(f"{trace.output_prefix}.csv")
+        print(f"Loop trace saved as: {trace.output_prefix}_*")
+    gr00t_client.close()
+    env.close()
+
 
-    
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(experiment_config.from_cli(description="closed-loop GR1 simulation against the gr00t inference server").simulation)
@@ -0,0 +1,181 @@
+import collections
+import copy
+import hashlib
+import threading
+import time
+import numpy as np
+
+
+# caches of the inference server
+
+
+class ActionChunkCache:
+    """
+    LRU cache of predicted action chunks keyed by a hash of (task, obs bytes, state)
+    only valid for a deterministic policy: keep it off when the action head samples noise (stochastic diffusion sampling)
+    max_entries: size bound, least recently used entries are evicted first
+    ttl: seconds an entry stays valid
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict() # key -> (insert time, actions)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(task: str, obs, state: dict) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(task.encode("utf-8"))
+        digest.update(np.ascontiguousarray(obs, dtype=np.uint8))
+        for joint_part_name in sorted(state):
+            digest.update(joint_part_name.encode("utf-8"))
+            digest.update(np.ascontiguousarray(state[joint_part_name], dtype=float))
+        return digest.digest()
+
+    def get(self, key: bytes):
+        """
+        returns the cached actions or None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            insert_time, actions = entry
+            if time.monotonic() - insert_time > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return actions
+
+    def put(self, key: bytes, actions: dict):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), actions)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class TaskTokenCache:
+    """
+    LRU cache of tokenizer outputs keyed on the exact task text (and tokenizer kwargs)
+    every /inference call carries the same long TASK string, so its tokenization can be reused;
+    in GR00T N1.5 the instruction is encoded by the backbone together with the image tokens,
+    so the tokenization (not the embedding) is the part that can safely be cached
+    """
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.miss_time = 0.0 # seconds spent tokenizing on misses
+        self.hit_time = 0.0 # seconds spent serving hits
+
+    def wrap(self, tokenizer):
+        return CachedTokenizer(tokenizer, self)
+
+    def stats(self) -> dict:
+        with self.lock:
+            mean_miss = self.miss_time / self.misses if self.misses else 0.0
+            mean_hit = self.hit_time / self.hits if self.hits else 0.0
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "mean_miss_ms": mean_miss * 1000,
+                "mean_hit_ms": mean_hit * 1000,
+                "saved_per_request_ms": (mean_miss - mean_hit) * 1000 if self.hits else 0.0,
+                "saved_total_s": (mean_miss - mean_hit) * self.hits,
+            }
+
+
+class CachedTokenizer:
+    """
+    callable stand-in for a (huggingface style) tokenizer: text-only calls are served from the TaskTokenCache,
+    anything else and every attribute access goes to the wrapped tokenizer
+    """
+    def __init__(self, tokenizer, cache: TaskTokenCache):
+        self.tokenizer = tokenizer
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        if name in ("tokenizer", "cache"): # not set yet (e.g. while copying)
+            raise AttributeError(name)
+        return getattr(self.tokenizer, name)
+
+    def __call__(self, text=None, *args, **kwargs):
+        if args or not (isinstance(text, str) or (isinstance(text, (list, tuple)) and all(isinstance(item, str) for item in text))):
+            return self.tokenizer(text, *args, **kwargs)
+        key = (text if isinstance(text, str) else tuple(text), repr(sorted(kwargs.items())))
+        cache = self.cache
+        start = time.perf_counter()
+        with cache.lock:
+            cached = cache.entries.get(key)
+            if cached is not None:
+                cache.entries.move_to_end(key)
+        if cached is not None:
+            # callers may modify the encoding (e.g. .to(device) in place), hand out a copy
+            output = copy.deepcopy(cached)
+            with cache.lock:
+                cache.hits += 1
+                cache.hit_time += time.perf_counter() - start
+            return output
+        output = self.tokenizer(text, **kwargs)
+        with cache.lock:
+            cache.misses += 1
+            cache.miss_time += time.perf_counter() - start
+            cache.entries[key] = copy.deepcopy(output)
+            while len(cache.entries) > cache.max_entries:
+                cache.entries.popitem(last=False)
+                cache.evictions += 1
+        return output
+
+
+def install_task_token_cache(policy, cache: TaskTokenCache) -> int:
+    """
+    replaces the tokenizers the policy exposes (policy.tokenizer, or processor.tokenizer of its modality transforms,
+    e.g. the eagle processor of GR00TTransform) with CachedTokenizer wrappers
+    returns how many were wrapped, 0 means this policy offers no tokenizer to cache
+    """
+    owners = [policy]
+    modality_transform = getattr(policy, "_modality_transform", None) or getattr(policy, "modality_transform", None)
+    if modality_transform is not None:
+        owners.append(modality_transform)
+        owners.extend(getattr(modality_transform, "transforms", []))
+    for owner in list(owners):
+        for name in ("processor", "eagle_processor", "vlm_processor"):
+            processor = getattr(owner, name, None)
+            if processor is not None:
+                owners.append(processor)
+    wrapped = 0
+    for owner in owners:
+        tokenizer = getattr(owner, "tokenizer", None)
+        if tokenizer is not None and not isinstance(tokenizer, CachedTokenizer):
+            setattr(owner, "tokenizer", cache.wrap(tokenizer))
+            wrapped += 1
+    return wrapped
@@ -0,0 +1,173 @@
+import bisect
+import cProfile
+import collections
+import importlib.util
+import os
+import pstats
+import threading
+import time
+import numpy as np
+
+
+# performance instrumentation of the inference server, served by its /metrics endpoint
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+RECENT_WINDOW = 1000 # observations kept for the percentiles
+
+
+class LatencyHistogram:
+    """
+    cumulative bucket counts (like a prometheus histogram) plus a window of recent values for percentiles
+    """
+    __slots__ = ("bucket_counts", "count", "total", "recent")
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1) # last one is +inf
+        self.count = 0
+        self.total = 0.0
+        self.recent = collections.deque(maxlen=RECENT_WINDOW)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        recent = np.array(self.recent)
+        cumulative = np.cumsum(self.bucket_counts)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count,
+            "p50": float(np.percentile(recent, 50)),
+            "p95": float(np.percentile(recent, 95)),
+            "p99": float(np.percentile(recent, 99)),
+            "buckets": {**{f"le_{bound}": int(count) for bound, count in zip(LATENCY_BUCKETS_MS, cumulative)}, "le_inf": int(cumulative[-1])},
+        }
+
+
+class ServerMetrics:
+    """
+    request / error counters and per-stage latency histograms (milliseconds)
+    stages: decode (request body), convert (np.array / step data), policy (get_action), serialize (response body)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.latencies = collections.defaultdict(LatencyHistogram)
+        self.batch_sizes = collections.Counter()
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.latencies[stage].observe(seconds * 1000)
+
+    def observe_batch_size(self, batch_size: int):
+        with self.lock:
+            self.batch_sizes[batch_size] += 1
+
+    def time(self, stage: str):
+        return _StageTimer(self, stage)
+
+    def mean_batch_size(self) -> float:
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            return sum(size * count for size, count in self.batch_sizes.items()) / batches if batches else 0.0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "latency_ms": {stage: histogram.snapshot() for stage, histogram in self.latencies.items()},
+                "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: ServerMetrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class ProfiledPolicy:
+    """
+    wraps a policy: times every get_action into metrics and, once armed, profiles the next N calls
+    kind "cprofile" writes one merged .prof (+ a text summary), kind "torch" writes one chrome trace per call
+    """
+    def __init__(self, policy, metrics: ServerMetrics, profile_dir: str = "./results/server_profile"):
+        self.policy = policy
+        self.metrics = metrics
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.kind = None
+        self.remaining = 0
+        self.captured = 0
+        self.profile = None
+
+    def arm(self, kind: str, request_num: int) -> dict:
+        if kind not in ("cprofile", "torch"):
+            raise ValueError(f"unknown profiler: {kind}")
+        # rejected here, not on the next (unrelated) inference call
+        if kind == "torch" and importlib.util.find_spec("torch") is None:
+            raise ValueError("torch profiler requested but torch is not installed")
+        if request_num < 1:
+            raise ValueError(f"requests must be at least 1, got {request_num}")
+        with self.lock:
+            self.kind = kind
+            self.remaining = request_num
+            self.captured = 0
+            self.profile = cProfile.Profile() if kind == "cprofile" else None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        return self.status()
+
+    def status(self) -> dict:
+        return {"kind": self.kind, "remaining": self.remaining, "profile_dir": self.profile_dir}
+
+    def get_action(self, step_data: dict) -> dict:
+        with self.metrics.time("policy"):
+            if self.remaining <= 0: # not armed, no locking on the hot path
+                return self.policy.get_action(step_data)
+            with self.lock: # profiled calls are serialized
+                if self.remaining <= 0:
+                    return self.policy.get_action(step_data)
+                if self.kind == "cprofile":
+                    predicted_action = self.profile.runcall(self.policy.get_action, step_data)
+                else:
+                    predicted_action = self._torch_profile(step_data)
+                self.remaining -= 1
+                self.captured += 1
+                if self.remaining == 0 and self.kind == "cprofile":
+                    path = os.path.join(self.profile_dir, "policy.prof")
+                    self.profile.dump_stats(path)
+                    with open(os.path.join(self.profile_dir, "policy_cprofile.txt"), "w") as f:
+                        pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(50)
+                    print(f"cProfile of {self.captured} requests saved as: {path}")
+                return predicted_action
+
+    def _torch_profile(self, step_data: dict) -> dict:
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=True) as profiler:
+            predicted_action = self.policy.get_action(step_data)
+        path = os.path.join(self.profile_dir, f"policy_torch_{self.captured}.json")
+        profiler.export_chrome_trace(path)
+        print(f"torch profile saved as: {path}")
+        return predicted_action
@@ -0,0 +1,258 @@
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import gr1_config
+
+
+# same-host transport between the simulator and the inference server
+# the client owns a shared memory ring of slots (task, state, obs in; action chunk out), the frame is never serialized:
+# the client writes it into its slot and the server hands a view of that slot to the policy
+# a unix socket only carries 8-byte doorbells (slot index, sequence number) in both directions
+# the socket is only accessible to its owner (0600), other local users cannot hand the server their segments
+
+TASK_MAX_BYTES = 2048
+ACTION_HORIZON = 16
+OBS_SHAPE = (256, 256, 3)
+DOORBELL = struct.Struct("<ii")
+_JOINT_MAP = gr1_config.gr00t_joint_map
+_STATE_SIZE = len(_JOINT_MAP.index)
+
+
+def _align(offset: int) -> int:
+    return (offset + 63) // 64 * 64
+
+
+class SlotLayout:
+    """
+    byte offsets of one ring slot: header | task | state | action flags | actions | obs
+    """
+    def __init__(self):
+        offset = 0
+        self.header = offset # int64 [task length, error flag]
+        offset = _align(offset + 2 * 8)
+        self.task = offset
+        offset = _align(offset + TASK_MAX_BYTES)
+        self.state = offset
+        offset = _align(offset + _STATE_SIZE * 8)
+        self.action_flags = offset # one uint8 per joint part: did the policy return actions for it
+        offset = _align(offset + len(_JOINT_MAP.joint_part_names))
+        self.actions = offset
+        offset = _align(offset + ACTION_HORIZON * _STATE_SIZE * 8)
+        self.obs = offset
+        offset = _align(offset + int(np.prod(OBS_SHAPE)))
+        self.size = offset
+
+
+SLOT_LAYOUT = SlotLayout()
+
+
+class RingSlot:
+    """
+    numpy views of one slot in the shared memory buffer
+    """
+    def __init__(self, buffer, index: int):
+        base = index * SLOT_LAYOUT.size
+        self.header = np.ndarray((2, ), dtype=np.int64, buffer=buffer, offset=base + SLOT_LAYOUT.header)
+        self.task = np.ndarray((TASK_MAX_BYTES, ), dtype=np.uint8, buffer=buffer, offset=base + SLOT_LAYOUT.task)
+        self.state = np.ndarray((_STATE_SIZE, ), dtype=np.float64, buffer=buffer, offset=base + SLOT_LAYOUT.state)
+        self.action_flags = np.ndarray((len(_JOINT_MAP.joint_part_names), ), dtype=np.uint8, buffer=buffer, offset=base + SLOT_LAYOUT.action_flags)
+        self.actions = np.ndarray((ACTION_HORIZON, _STATE_SIZE), dtype=np.float64, buffer=buffer, offset=base + SLOT_LAYOUT.actions)
+        self.obs = np.ndarray(OBS_SHAPE, dtype=np.uint8, buffer=buffer, offset=base + SLOT_LAYOUT.obs)
+
+    def write_request(self, task: str, obs: np.ndarray, state: dict):
+        task_bytes = task.encode("utf-8")
+        if len(task_bytes) > TASK_MAX_BYTES:
+            raise ValueError(f"task longer than {TASK_MAX_BYTES} bytes")
+        self.task[:len(task_bytes)] = np.frombuffer(task_bytes, dtype=np.uint8)
+        self.header[0] = len(task_bytes)
+        self.header[1] = 0
+        for joint_part_name, part_slice in _JOINT_MAP.part_slices.items():
+            self.state[part_slice] = state[joint_part_name]
+        np.copyto(self.obs, obs)
+
+    def read_request(self) -> tuple:
+        """
+        returns (task, obs, state), obs and state are views into shared memory
+        """
+        task = self.task[:self.header[0]].tobytes().decode("utf-8")
+        state = {joint_part_name: self.state[part_slice] for joint_part_name, part_slice in _JOINT_MAP.part_slices.items()}
+        return task, self.obs, state
+
+    def write_actions(self, actions: dict):
+        self.action_flags[:] = 0
+        for part_idx, (joint_part_name, part_slice) in enumerate(_JOINT_MAP.part_slices.items()):
+            name = f"action.{joint_part_name}"
+            if name in actions:
+                self.actions[:, part_slice] = actions[name]
+                self.action_flags[part_idx] = 1
+
+    def write_error(self, error: str):
+        error_bytes = error.encode("utf-8")[:TASK_MAX_BYTES]
+        self.task[:len(error_bytes)] = np.frombuffer(error_bytes, dtype=np.uint8)
+        self.header[0] = len(error_bytes)
+        self.header[1] = 1
+
+    def read_actions(self) -> dict:
+        if self.header[1]:
+            raise RuntimeError(f"inference failed on the server: {self.task[:self.header[0]].tobytes().decode('utf-8')}")
+        return {
+            f"action.{joint_part_name}": self.actions[:, part_slice].copy()
+            for part_idx, (joint_part_name, part_slice) in enumerate(_JOINT_MAP.part_slices.items())
+            if self.action_flags[part_idx]
+        }
+
+
+SEGMENT_PREFIX = "gr00t_"
+_created_segments = set() # rings created (and tracked) by this process
+
+
+def create_ring(num_slots: int) -> tuple:
+    """
+    creates a uniquely named shared memory ring, returns (memory, slots); the creator unlinks it when done
+    """
+    memory = shared_memory.SharedMemory(name=f"{SEGMENT_PREFIX}{uuid.uuid4().hex[:12]}", create=True, size=num_slots * SLOT_LAYOUT.size)
+    _created_segments.add(memory.name)
+    return memory, [RingSlot(memory.buf, index) for index in range(num_slots)]
+
+
+def attach_ring(name: str, num_slots: int) -> tuple:
+    """
+    attaches to a ring created by another process, returns (memory, slots)
+    the segment stays owned by its creator: it is not registered with this process's resource tracker,
+    which would otherwise unlink it (or warn about a leak) when this process exits
+    """
+    if not name.startswith(SEGMENT_PREFIX) or "/" in name:
+        raise ValueError(f"not a gr00t shared memory ring: {name!r}")
+    if sys.version_info >= (3, 13):
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        memory = shared_memory.SharedMemory(name=name)
+        if name not in _created_segments: # client and server in one process share the tracker entry of the creator
+            resource_tracker.unregister(memory._name, "shared_memory")
+    if num_slots < 1 or memory.size < num_slots * SLOT_LAYOUT.size:
+        memory.close()
+        raise ValueError(f"shared memory ring {name} is too small for {num_slots} slots")
+    return memory, [RingSlot(memory.buf, index) for index in range(num_slots)]
+
+
+def send_handshake(connection: socket.socket, memory: shared_memory.SharedMemory, num_slots: int):
+    handshake = json.dumps({"name": memory.name, "num_slots": num_slots}).encode("utf-8")
+    connection.sendall(struct.pack("<I", len(handshake)) + handshake)
+
+
+def recv_exactly(connection: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("shared memory peer disconnected")
+        data += chunk
+    return data
+
+
+class ShmInferenceServer:
+    """
+    accepts Gr00tShmClient connections on a unix socket, one thread per client
+    infer_fn(task, obs, state) -> actions is called with views into the client's shared memory
+    """
+    def __init__(self, infer_fn, socket_path: str = "/tmp/gr00t_inference.sock"):
+        self.infer_fn = infer_fn
+        self.socket_path = socket_path
+        self._remove_stale_socket(socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(socket_path)
+        os.chmod(socket_path, 0o600)
+        self.socket_inode = os.stat(socket_path).st_ino # stop() only removes this socket, never a successor's
+        self.listener.listen()
+        self.thread = None
+        self.running = False
+
+    @staticmethod
+    def _remove_stale_socket(socket_path: str):
+        """
+        raises when another server is listening on socket_path, removes a socket left behind by a dead one
+        """
+        try:
+            mode = os.stat(socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"{socket_path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"another inference server is listening on {socket_path}")
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+        return self
+
+    def _accept(self):
+        while self.running:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError: # listener closed
+                break
+            threading.Thread(target=self._serve, args=(connection, ), daemon=True).start()
+
+    def _serve(self, connection: socket.socket):
+        try:
+            (handshake_len, ) = struct.unpack("<I", recv_exactly(connection, 4))
+            handshake = json.loads(recv_exactly(connection, min(handshake_len, 4096)))
+            memory, slots = attach_ring(handshake["name"], int(handshake["num_slots"]))
+        except ConnectionError: # e.g. the liveness probe of another server
+            connection.close()
+            return
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(f"Shared memory client rejected: {error!r}")
+            connection.close()
+            return
+        send_lock = threading.Lock()
+        try:
+            while True:
+                slot_index, seq = DOORBELL.unpack(recv_exactly(connection, DOORBELL.size))
+                if not 0 <= slot_index < len(slots):
+                    break
+                # requests of one client may be pipelined, serve them concurrently
+                threading.Thread(target=self._handle, args=(connection, send_lock, slots[slot_index], slot_index, seq), daemon=True).start()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            connection.close()
+            slots.clear()
+            memory.close()
+
+    def _handle(self, connection: socket.socket, send_lock: threading.Lock, slot: RingSlot, slot_index: int, seq: int):
+        try:
+            task, obs, state = slot.read_request()
+            slot.write_actions(self.infer_fn(task, obs, state))
+        except Exception as error:
+            slot.write_error(repr(error))
+        with send_lock:
+            try:
+                connection.sendall(DOORBELL.pack(slot_index, seq))
+            except OSError:
+                pass
+
+    def stop(self):
+        self.running = False
+        self.listener.close()
+        try:
+            if os.stat(self.socket_path).st_ino == self.socket_inode:
+                os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,91 @@
+# python -m pytest -q test_gr00t_server_utils.py
+
+import asyncio
+import numpy as np
+from fastapi.testclient import TestClient
+
+import gr00t_transport
+from gr00t_server_utils import DynamicBatcher, InvalidRequest, StubPolicy, create_app
+
+
+STATE = {"left_arm": [0.0] * 7, "right_arm": [0.0] * 7}
+
+
+def make_client(**kwargs) -> TestClient:
+    policy = StubPolicy(fixed_latency=0.0, per_sample_latency=0.0, tokenizer_latency=0.0)
+    return TestClient(create_app(policy, **kwargs))
+
+
+def make_obs(*leading) -> list:
+    return np.zeros(leading + (256, 256, 3), dtype=np.uint8).tolist()
+
+
+def test_valid_json_request():
+    with make_client() as client:
+        response = client.post("/inference", json={"task": "pour", "obs": make_obs(), "state": STATE})
+    assert response.status_code == 200
+    assert np.asarray(response.json()["action.left_arm"]).shape == (16, 7)
+
+
+def test_json_obs_of_wrong_shape_is_422():
+    with make_client() as client:
+        response = client.post("/inference", json={"task": "pour", "obs": [1, 2, 3], "state": STATE})
+    assert response.status_code == 422
+
+
+def test_binary_obs_of_wrong_size_is_422():
+    body = gr00t_transport.encode_inference_request("pour", np.zeros((10, 10, 3), dtype=np.uint8), STATE)
+    with make_client() as client:
+        response = client.post("/inference", content=body, headers={"content-type": gr00t_transport.BINARY_CONTENT_TYPE})
+    assert response.status_code == 422
+
+
+def test_string_state_values_are_422():
+    with make_client() as client:
+        response = client.post("/inference", json={"task": "pour", "obs": make_obs(), "state": {"left_arm": ["a", "b"]}})
+    assert response.status_code == 422
+
+
+def test_batch_length_mismatch_is_422():
+    state = {"left_arm": [[0.0] * 7] * 3}
+    with make_client() as client:
+        response = client.post("/inference_batch", json={"tasks": ["pour", "pour"], "obs": make_obs(2), "state": state})
+        assert response.status_code == 422
+        response = client.post("/inference_batch", json={"tasks": ["pour", "pour"], "obs": make_obs(3), "state": {"left_arm": [[0.0] * 7] * 2}})
+        assert response.status_code == 422
+
+
+class CountingPolicy(StubPolicy):
+    def __init__(self):
+        super().__init__(fixed_latency=0.0, per_sample_latency=0.0, tokenizer_latency=0.0)
+        self.batch_sizes = []
+
+    def get_action(self, step_data: dict) -> dict:
+        self.batch_sizes.append(step_data["video.ego_view"].shape[0])
+        return super().get_action(step_data)
+
+
+def submit_together(batcher: DynamicBatcher, *requests) -> list:
+    async def run():
+        return await asyncio.gather(*(batcher.submit(*request) for request in requests), return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_malformed_request_fails_only_itself():
+    policy = CountingPolicy()
+    batcher = DynamicBatcher(policy, max_batch_size=4, max_wait_ms=50)
+    obs = np.zeros((256, 256, 3), dtype=np.uint8)
+    good, bad, other = submit_together(batcher, ("pour", obs, STATE), ("pour", [1, 2, 3], STATE), ("pour", obs, STATE))
+    assert isinstance(bad, InvalidRequest)
+    assert good["action.left_arm"].shape == (16, 7) and other["action.left_arm"].shape == (16, 7)
+    assert policy.batch_sizes == [2]
+
+
+def test_incompatible_requests_are_retried_one_by_one():
+    policy = CountingPolicy()
+    batcher = DynamicBatcher(policy, max_batch_size=4, max_wait_ms=50)
+    obs = np.zeros((256, 256, 3), dtype=np.uint8)
+    first, second = submit_together(batcher, ("pour", obs, STATE), ("pour", obs, {"left_arm": [0.0] * 5}))
+    assert first["action.left_arm"].shape == (16, 7)
+    assert second["action.left_arm"].shape == (16, 5)
+    assert policy.batch_sizes == [1, 1]
@@ -0,0 +1,28 @@
+# python -m pytest -q test_lerobot_recorder.py
+
+import json
+import os
+import numpy as np
+
+from lerobot_recorder import LeRobotRecorder
+
+
+def record_episode(recorder: LeRobotRecorder, task: str, frame_num: int = 3) -> int:
+    recorder.start_episode(task)
+    for _ in range(frame_num):
+        recorder.add_frame(np.zeros((200, 256, 4), dtype=np.uint8), np.zeros(54), np.zeros(54))
+    return recorder.end_episode()
+
+
+def test_end_episode_removes_stale_stats(tmp_path):
+    recorder = LeRobotRecorder(str(tmp_path))
+    assert record_episode(recorder, "pour") == 0
+    stats_path = os.path.join(tmp_path, "meta", "stats.json")
+    with open(stats_path, "w") as f: # as written by LeRobotSingleDataset when the dataset was loaded
+        json.dump({"action": {"mean": [0.0]}}, f)
+    assert record_episode(recorder, "pour") == 1
+    recorder.close()
+    assert not os.path.exists(stats_path)
+    with open(os.path.join(tmp_path, "meta", "info.json")) as f:
+        info = json.load(f)
+    assert info["total_episodes"] == 2 and info["total_frames"] == 6
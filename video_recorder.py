@@ -0,0 +1,101 @@
+import queue
+import threading
+import cv2
+import numpy as np
+
+
+class AsyncVideoRecorder:
+    """
+    drop-in for cv2.VideoWriter (write / release) that encodes on a background thread
+    frames go through a bounded queue; when it is full, drop_policy decides:
+        "block": wait for the encoder (no frame is lost)
+        "drop_newest": skip the incoming frame
+        "drop_oldest": replace the oldest queued frame
+    every_k: record only every k-th frame (the fps of the file is divided accordingly)
+    scale: resize factor applied on the encoder thread
+    an error on the encoder thread is raised again by the next write() or by release()
+    """
+    def __init__(self, path: str, fps: float, frame_size: tuple, queue_size: int = 64, drop_policy: str = "block", every_k: int = 1, scale: float = 1.0):
+        if drop_policy not in ("block", "drop_newest", "drop_oldest"):
+            raise ValueError(f"unknown drop policy: {drop_policy}")
+        self.drop_policy = drop_policy
+        self.every_k = every_k
+        self.frame_size = frame_size
+        self.output_size = (int(round(frame_size[0] * scale)), int(round(frame_size[1] * scale)))
+        self.frame_count = 0
+        self.written_count = 0
+        self.dropped_count = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MP4V'), fps / every_k, self.output_size, isColor=True)
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def write(self, frame: np.ndarray):
+        """
+        frame: (height, width, 3) bgr, copied so the caller may reuse its buffer
+        """
+        self.frame_count += 1
+        if (self.frame_count - 1) % self.every_k != 0:
+            return
+        self._raise_error()
+        frame = frame.copy()
+        if self.drop_policy == "block":
+            self._put(frame)
+            return
+        try:
+            self.queue.put_nowait(frame)
+            return
+        except queue.Full:
+            pass
+        self.dropped_count += 1
+        if self.drop_policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(frame)
+            except queue.Full:
+                pass
+
+    def _put(self, item, timeout: float = 0.1):
+        """
+        blocking put that gives up when the encoder thread is gone
+        """
+        while True:
+            try:
+                self.queue.put(item, timeout=timeout)
+                return
+            except queue.Full:
+                if not self.thread.is_alive():
+                    self._raise_error()
+                    raise RuntimeError("video encoder thread stopped")
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError("video encoding failed") from self.error
+
+    def _encode(self):
+        try:
+            while True:
+                frame = self.queue.get()
+                if frame is None:
+                    break
+                if self.output_size != self.frame_size:
+                    frame = cv2.resize(frame, self.output_size, interpolation=cv2.INTER_AREA)
+                self.video.write(frame)
+                self.written_count += 1
+        except Exception as error:
+            self.error = error
+
+    def release(self):
+        # flush: everything queued before release is still encoded
+        if self.thread.is_alive():
+            try:
+                self._put(None)
+            except RuntimeError:
+                pass
+        self.thread.join()
+        self.video.release()
+        self._raise_error()